@@ -7,6 +7,7 @@ import argparse
 import time
 import tkinter as tk
 
+from corpus import PuzzleCorpus
 from gui import SudokuUI
 from sudokugame import SudokuGame
 
@@ -41,8 +42,7 @@ class App(object):
                                                           30))
         self.ui.activity_log_toplevel.geometry('%dx%d+%d+%d'% (260, TOPLEVEL_HEIGHT,
                                                                TOPLEVEL_WIDTH + 30, 30))
-        self.__undo_stack = self.ui.log
-        self.__redo_stack = []
+        self.__history = self.ui.log
         self.__update_timer()
         self.__make_menus()
         self.root.bind('<Command-z>', lambda _: self.__undo_move())
@@ -94,12 +94,12 @@ class App(object):
         self.__make_file_item(menu,
                               'Undo',
                               tk.NORMAL,
-                              self.__undo_move(),
+                              self.__undo_move,
                               'Command+Z')
         self.__make_file_item(menu,
                               'Redo',
                               tk.NORMAL,
-                              self.__redo_move(),
+                              self.__redo_move,
                               'Command+Shift+Z')
 
         menu.add_separator()
@@ -119,9 +119,9 @@ class App(object):
 
         labels = ['Solve Puzzle', 'Solve Row', 'Solve Column',
                 'Solve Box', 'Solve Cell']
-        commands = [self.__clear_puzzle, self.__clear_row,
-                    self.__clear_column, self.__clear_box,
-                    self.__clear_box]
+        commands = [self.__solve_puzzle, self.__solve_row,
+                    self.__solve_column, self.__solve_box,
+                    self.__solve_cell]
 
         for _ in zip(labels, states, commands, accelerators):
             self.__make_file_item(menu, *_)
@@ -159,23 +159,23 @@ class App(object):
 
 
     def __solve_puzzle(self):
-        pass
+        self.ui.solve('puzzle')
 
 
     def __solve_row(self):
-        pass
+        self.ui.solve('row')
 
 
     def __solve_column(self):
-        pass
+        self.ui.solve('column')
 
 
     def __solve_box(self):
-        pass
+        self.ui.solve('box')
 
 
     def __solve_cell(self):
-        pass
+        self.ui.solve('cell')
 
 
     def __clear_puzzle(self):
@@ -200,71 +200,43 @@ class App(object):
 
 
     def __undo_move(self):
-        if self.__undo_stack:
-            self.ui.listbox.delete(0)
-            number = self.__undo_stack.pop()
-            self.__redo_stack.append(number)
-
-            if number > 0:
+        self.__undo_n_moves(1)
 
-                row, col = number // 100 - 1, (number % 100) // 10 - 1
 
-                for i in range(len(self.__undo_stack) - 1, -1, -1):
-                    x = self.__undo_stack[i]
-                    x_row, x_col = x // 100 - 1, (x % 100) // 10 - 1
+    def __undo_n_moves(self, n=None):
+        """
+        Undoes the last n moves, by default down to the one selected
+        in the activity log.
+        """
 
-                    if x_row == row and x_col == col:
-                        self.ui.game.puzzle[row][col] = x % 10
-                        break
+        if n is None:
+            try:
+                n = self.ui.listbox.curselection()[0] + 1
+            except IndexError:
+                n = 0
 
-                else:
-                    self.ui.game.puzzle[row][col] = 0
+        undone = 0
 
-            else:
-                number *= -1
+        for _ in range(n):
+            move = self.__history.undo()
 
-                row, col, entry = number // 100 - 1, (number % 100) // 10 - 1, number % 10
+            if move is None:
+                break
 
-                self.ui.game.puzzle[row][col] = entry
+            self.ui.game.set_puzzle_entry(move.row, move.col, move.previous)
+            undone += 1
 
+        if undone:
+            self.ui.listbox.delete(0, undone - 1)
             self.ui.draw_puzzles()
 
 
-    def __undo_n_moves(self):
-        try:
-            index = self.ui.listbox.curselection()[0]
-        except IndexError:
-            index = -1
-
-
-        for i in range(index + 1):
-            self.__undo_move()
-
-
     def __redo_move(self):
-        if self.__redo_stack:
-            number = self.__redo_stack.pop()
-            self.__undo_stack.append(number)
-
-            if number > 0:
-
-                row, col = number // 100 - 1, (number % 100) // 10 - 1
-                entry = number % 10
-
-                self.ui.game.puzzle[row][col] = entry
-
-                string = 'Entered %d in row %d column % d' % (entry, row + 1, col + 1)
-
-            else:
-                number *= -1
-                row, col, entry = number // 100 - 1, (number % 100) // 10 - 1, number % 10
-
-                self.ui.game.puzzle[row][col] = 0
-
-                string = 'Deleted %d in row %d column % d' % (entry, row + 1, col + 1)
-
-            self.ui.listbox.insert(0, string)
+        move = self.__history.redo()
 
+        if move is not None:
+            self.ui.game.set_puzzle_entry(move.row, move.col, move.number)
+            self.ui.listbox.insert(0, str(move))
             self.ui.draw_puzzles()
 
 
@@ -272,30 +244,38 @@ class App(object):
 def parse_arguments():
     """
     Parses arguments of the form:
-        sudoku.py <board name>
-    where 'board name' must be in the BOARD list
+        sudoku.py --board <board name or puzzle file> [--number <n>]
+    where 'board name' is in the BOARD list, and n picks a puzzle of
+    the file, counting from 0
     """
 
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument('--board',
-                             help='Desired board name',
+                             help='Board name (%s) or puzzle file' % ', '.join(BOARDS),
                              type=str,
-                             choices=BOARDS,
                              required=True)
+    arg_parser.add_argument('--number',
+                             help='Puzzle of the file to play',
+                             type=int,
+                             default=0)
 
     args = vars(arg_parser.parse_args())
 
-    return args['board']
+    return args['board'], args['number']
 
 def main():
-    board_name = parse_arguments()
+    board_name, number = parse_arguments()
+
+    if board_name in BOARDS:
+        board_name = '%s.sudoku' % board_name
 
-    with open('%s.sudoku' % board_name, 'r') as boards_file:
+    with PuzzleCorpus(board_name) as corpus:
+        board = corpus[number]
 
-        game = SudokuGame(boards_file)
-        game.start()
+    game = SudokuGame()
+    game.load(board)
 
-        App(game)
+    App(game)
 
 if __name__ == '__main__':
     main()
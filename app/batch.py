@@ -0,0 +1,218 @@
+# file:     batch.py
+# author:   Adam Felix
+# help:     NumPy (numpy.org)
+
+# Batch engine:     N boards are held as one (N, 9, 9) uint8 array and
+#                   their candidates as one (N, 81) uint16 array of
+#                   bit masks.  The candidates, naked singles and
+#                   hidden singles are worked out for the whole batch
+#                   at once; the boards that singles alone cannot
+#                   finish are handed to SudokuSolver.
+
+import argparse
+import itertools
+import sys
+
+import numpy as np
+
+from candidates import ALL, NUMBER, POPCOUNT
+from solver import BACKENDS, SudokuSolver
+from sudokugame import SudokuBoard, parse_lines
+from units import CELL_UNITS, UNITS
+
+
+_UNITS = np.array(UNITS, dtype=np.intp)
+
+# cell -> index (0-26) of its row, column and box in _UNITS, and its
+# position inside each of them
+_CELL_UNITS = np.array([[UNITS.index(unit) for unit in CELL_UNITS[cell]]
+                        for cell in range(81)], dtype=np.intp)
+_CELL_POSITIONS = np.array([[unit.index(cell) for unit in CELL_UNITS[cell]]
+                            for cell in range(81)], dtype=np.intp)
+
+_BIT = np.array([0] + [1 << k for k in range(9)], dtype=np.uint16)
+_SHIFTS = np.arange(9, dtype=np.uint16)
+_POPCOUNT = np.frombuffer(POPCOUNT, dtype=np.uint8)
+_NUMBER = np.frombuffer(NUMBER, dtype=np.uint8)
+
+
+class BatchSolver(object):
+    """
+    Solves a batch of SudokuBoards together.
+    """
+
+    def __init__(self, boards, backend='strategies'):
+        grid = np.frombuffer(b''.join(board.grid for board in boards), dtype=np.uint8)
+        n = len(grid) // 81
+
+        self.boards = grid.reshape(n, 9, 9).copy()
+        self.candidates = np.zeros((n, 81), dtype=np.uint16)
+        self.failed = np.zeros(n, dtype=bool)
+        self.stalled = np.zeros(n, dtype=bool)
+        self.backend = backend
+
+
+    def __len__(self):
+        return len(self.boards)
+
+
+    def solve(self):
+        """
+        Places singles over the whole batch until every board is
+        solved, stuck or found to be contradictory, then finishes the
+        stuck ones one by one with SudokuSolver.
+        """
+
+        grid = self.boards.reshape(len(self), 81)
+        active = np.arange(len(self))
+
+        while active.size:
+            candidates, failed = _candidates(grid[active])
+            placed, contradiction = _singles(grid[active], candidates)
+
+            self.candidates[active] = candidates
+
+            failed |= contradiction
+            progress = (placed != 0).any(axis=1) & ~failed
+            grid[active] += placed * progress[:, None].astype(np.uint8)
+
+            self.failed[active[failed]] = True
+            self.stalled[active[~failed & ~progress & (grid[active] == 0).any(axis=1)]] = True
+
+            active = active[progress]
+
+        stalled = np.flatnonzero(self.stalled)
+
+        if stalled.size:
+            solver = SudokuSolver(backend=self.backend)
+
+            for board in stalled:
+                solver.load(SudokuBoard.from_string(
+                        (grid[board] + ord('0')).tobytes().decode('ascii')))
+
+                grid[board] = np.frombuffer(solver.solution().encode('ascii'),
+                                            dtype=np.uint8) - ord('0')
+
+
+    def solutions(self):
+        """
+        Yields every board as an 81-char line, '0' for cells left
+        unsolved.
+        """
+
+        lines = (self.boards.reshape(len(self), 81) + ord('0')).tobytes().decode('ascii')
+
+        for i in range(0, len(lines), 81):
+            yield lines[i:i + 81]
+
+
+def _candidates(grid):
+    """
+    Candidate masks of the (n, 81) grid, and which boards already hold
+    a repeated number in some unit.
+    """
+
+    bits = _BIT[grid]
+    placed = bits[:, _UNITS]
+    seen = np.bitwise_or.reduce(placed, axis=2)
+
+    repeated = (_POPCOUNT[seen] != (placed != 0).sum(axis=2)).any(axis=1)
+
+    seen = np.bitwise_or.reduce(seen[:, _CELL_UNITS], axis=2)
+
+    return np.where(grid != 0, bits, ALL & ~seen).astype(np.uint16), repeated
+
+
+def _singles(grid, candidates):
+    """
+    The numbers forced into the empty cells of the (n, 81) grid by
+    naked and hidden singles, and which boards ran into a
+    contradiction (an empty cell with no candidates, a number with no
+    place in a unit, or a cell forced to two numbers).
+    """
+
+    empty = grid == 0
+
+    digits = ((candidates[:, :, None] >> _SHIFTS) & 1).astype(bool)
+    digits &= empty[:, :, None]
+
+    in_units = digits[:, _UNITS, :]
+    counts = in_units.sum(axis=2)
+
+    solved = np.bitwise_or.reduce(_BIT[grid][:, _UNITS], axis=2)
+    solved = ((solved[:, :, None] >> _SHIFTS) & 1).astype(bool)
+
+    contradiction = ((empty & (candidates == 0)).any(axis=1)
+                     | ((counts == 0) & ~solved).any(axis=(1, 2)))
+
+    hidden = in_units & (counts == 1)[:, :, None, :]
+    hidden = hidden[:, _CELL_UNITS, _CELL_POSITIONS, :].any(axis=2)
+    hidden = (hidden.astype(np.uint16) << _SHIFTS).sum(axis=2, dtype=np.uint16)
+
+    contradiction |= (_POPCOUNT[hidden] > 1).any(axis=1)
+
+    naked = empty & (_POPCOUNT[candidates] == 1)
+
+    placed = np.where(naked, _NUMBER[candidates], _NUMBER[hidden])
+
+    return placed.astype(np.uint8), contradiction
+
+
+def solve_batches(puzzles, batch_size=4096, backend='strategies'):
+    """
+    Yields the solution of each puzzle in the lines of puzzles, in
+    any format parse_lines reads, in order, solving them batch_size
+    at a time.
+    """
+
+    boards = parse_lines(puzzles)
+
+    while True:
+        chunk = list(itertools.islice(boards, batch_size))
+
+        if not chunk:
+            return
+
+        batch = BatchSolver(chunk, backend=backend)
+        batch.solve()
+
+        yield from batch.solutions()
+
+
+def parse_arguments():
+    """
+    Parses arguments of the form:
+        batch.py [puzzle file] [--batch-size <n>] [--backend <backend>]
+    """
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('puzzles',
+                            help='File of puzzles (default: stdin)',
+                            nargs='?',
+                            type=argparse.FileType('rb'),
+                            default=sys.stdin.buffer)
+    arg_parser.add_argument('--batch-size',
+                            help='Boards solved together',
+                            type=int,
+                            default=4096)
+    arg_parser.add_argument('--backend',
+                            help='Backend for the boards singles cannot finish',
+                            type=str,
+                            choices=BACKENDS,
+                            default='strategies')
+
+    return vars(arg_parser.parse_args())
+
+
+def main():
+    args = parse_arguments()
+
+    with args['puzzles'] as puzzles:
+        for solution in solve_batches(puzzles,
+                                      batch_size=args['batch_size'],
+                                      backend=args['backend']):
+            sys.stdout.write(solution + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+# file:     benchmark.py
+# author:   Adam Felix
+# help:     time, tracemalloc (Python docs)
+
+# Benchmark:    every backend solves every corpus, puzzle by puzzle,
+#               repeat times over.  The timings come from a plain run;
+#               the peak memory from one more run under tracemalloc,
+#               which slows everything down.  A solve running past the
+#               time limit is stopped and counted as a timeout.  The
+#               results go out as a table and, for comparing commits,
+#               as JSON.
+
+import argparse
+import json
+import os
+import platform
+import signal
+import sys
+import time
+import tracemalloc
+
+from solver import BACKENDS, SudokuSolver
+from sudokugame import parse_lines
+from units import UNITS
+
+
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+CORPORA = ('easy', 'hard', '17-clue', 'adversarial')
+
+PERCENTILES = (50, 90, 99)
+
+# seconds a single solve may take (SIGALRM, so only where the platform
+# has setitimer)
+TIME_LIMIT = 10.0
+
+_DIGITS = set(range(1, 10))
+
+
+class SolveTimeout(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise SolveTimeout()
+
+
+def load_corpus(name):
+    """
+    The boards of a bundled corpus, or of a puzzle file.
+    """
+
+    path = name
+
+    if name in CORPORA:
+        path = os.path.join(CORPORA_DIR, name + '.txt')
+
+    with open(path, 'rb') as puzzle_file:
+        return list(parse_lines(puzzle_file))
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of the sorted values.
+    """
+
+    rank = max(1, -(-len(values) * p // 100))
+
+    return values[rank - 1]
+
+
+def is_solution(clues, grid):
+    """
+    Whether the 81-cell grid is filled in, keeps every clue and holds
+    1-9 in every row, column and box.
+    """
+
+    if any(clue and clue != number for clue, number in zip(clues, grid)):
+        return False
+
+    return all({grid[cell] for cell in unit} == _DIGITS for unit in UNITS)
+
+
+def run(backend, boards, repeat=1, time_limit=TIME_LIMIT):
+    """
+    Solves boards repeat times with one solver.  Returns the latency
+    in seconds of every solve, and for the last round the search
+    nodes of every board, how many boards were solved and how many
+    timed out.  A solve is stopped after time_limit seconds (None or
+    0 for no limit); its latency is then the time it was given and
+    its nodes those searched so far.
+    """
+
+    solver = SudokuSolver(backend=backend)
+    latencies, nodes, solved, timeouts = [], [], 0, 0
+
+    if not hasattr(signal, 'setitimer'):
+        time_limit = None
+
+    if time_limit:
+        handler = signal.signal(signal.SIGALRM, _alarm)
+
+    try:
+        for _ in range(repeat):
+            nodes, solved, timeouts = [], 0, 0
+
+            for board in boards:
+                start = time.perf_counter()
+
+                try:
+                    if time_limit:
+                        signal.setitimer(signal.ITIMER_REAL, time_limit)
+
+                    solver.load(board)
+                    timed_out = False
+
+                except SolveTimeout:
+                    timed_out = True
+
+                finally:
+                    if time_limit:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+
+                latencies.append(time.perf_counter() - start)
+                nodes.append(solver.nodes)
+
+                if timed_out:
+                    timeouts += 1
+
+                else:
+                    solved += is_solution(board.grid, solver.game.puzzle)
+
+    finally:
+        if time_limit:
+            signal.signal(signal.SIGALRM, handler)
+
+    return latencies, nodes, solved, timeouts
+
+
+def peak_memory(backend, boards, time_limit=TIME_LIMIT):
+    """
+    Peak bytes allocated while one solver solves boards once.
+    """
+
+    tracemalloc.start()
+
+    try:
+        run(backend, boards, time_limit=time_limit)
+        return tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(backend, name, repeat=1, memory=True, time_limit=TIME_LIMIT):
+    """
+    The result record of one backend on one corpus.
+    """
+
+    boards = load_corpus(name)
+    latencies, nodes, solved, timeouts = run(backend, boards, repeat, time_limit)
+    total = sum(latencies)
+    latencies.sort()
+
+    latency = {'mean': 1000 * total / len(latencies)}
+    latency.update(('p%d' % p, 1000 * percentile(latencies, p)) for p in PERCENTILES)
+    latency['max'] = 1000 * latencies[-1]
+
+    return {
+        'backend': backend,
+        'corpus': name,
+        'puzzles': len(boards),
+        'solved': solved,
+        'timeouts': timeouts,
+        'time_limit': time_limit,
+        'repeat': repeat,
+        'seconds': total,
+        'puzzles_per_second': len(latencies) / total if total else None,
+        'latency_ms': latency,
+        'nodes': {'total': sum(nodes), 'mean': sum(nodes) / len(nodes), 'max': max(nodes)},
+        'peak_memory_kib': peak_memory(backend, boards, time_limit) / 1024 if memory else None,
+    }
+
+
+def compare(results, baseline):
+    """
+    Lines comparing the mean latency of results against those of a
+    baseline JSON report.
+    """
+
+    before = {(r['backend'], r['corpus']): r for r in baseline['results']}
+
+    for result in results:
+        old = before.get((result['backend'], result['corpus']))
+
+        if old is None:
+            continue
+
+        ratio = result['latency_ms']['mean'] / old['latency_ms']['mean']
+
+        yield '%-10s %-12s %9.3f -> %9.3f ms  (x%.2f)' % (
+                result['backend'], result['corpus'],
+                old['latency_ms']['mean'], result['latency_ms']['mean'], ratio)
+
+
+def report(results):
+    yield '%-10s %-12s %7s %8s %9s %9s %9s %9s %9s %10s %10s' % (
+            'backend', 'corpus', 'solved', 'timeouts', 'puz/s', 'mean ms', 'p50 ms',
+            'p99 ms', 'max ms', 'nodes', 'peak KiB')
+
+    for r in results:
+        latency = r['latency_ms']
+
+        yield '%-10s %-12s %3d/%-3d %8d %9.1f %9.3f %9.3f %9.3f %9.3f %10d %10s' % (
+                r['backend'], r['corpus'], r['solved'], r['puzzles'], r['timeouts'],
+                r['puzzles_per_second'] or 0, latency['mean'], latency['p50'],
+                latency['p99'], latency['max'], r['nodes']['total'],
+                '-' if r['peak_memory_kib'] is None else '%.0f' % r['peak_memory_kib'])
+
+
+def parse_arguments():
+    """
+    Parses arguments of the form:
+        benchmark.py [corpus ...] [--backend <backend> ...] [--repeat <n>]
+                     [--time-limit <seconds>] [--json <path>]
+                     [--compare <path>] [--no-memory]
+    where a corpus is a bundled one (easy, hard, 17-clue, adversarial,
+    all by default) or a puzzle file
+    """
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('corpora',
+                            help='Corpora to run (default: %s)' % ', '.join(CORPORA),
+                            nargs='*',
+                            default=list(CORPORA))
+    arg_parser.add_argument('--backend',
+                            help='Backends to run (default: all)',
+                            choices=BACKENDS,
+                            action='append')
+    arg_parser.add_argument('--repeat',
+                            help='Times each corpus is solved',
+                            type=int,
+                            default=1)
+    arg_parser.add_argument('--time-limit',
+                            help='Seconds a single solve may take, 0 for no limit (default: %g)' % TIME_LIMIT,
+                            type=float,
+                            default=TIME_LIMIT)
+    arg_parser.add_argument('--json',
+                            help='Write the results as JSON to this file',
+                            type=str,
+                            default=None)
+    arg_parser.add_argument('--compare',
+                            help='JSON results of an earlier run to compare with',
+                            type=str,
+                            default=None)
+    arg_parser.add_argument('--no-memory',
+                            help='Skip the peak memory run',
+                            action='store_true')
+
+    return vars(arg_parser.parse_args())
+
+
+def main():
+    args = parse_arguments()
+
+    results = [benchmark(backend, name, repeat=args['repeat'],
+                         memory=not args['no_memory'],
+                         time_limit=args['time_limit'])
+               for backend in args['backend'] or BACKENDS
+               for name in args['corpora']]
+
+    for line in report(results):
+        sys.stdout.write(line + '\n')
+
+    if args['compare'] is not None:
+        with open(args['compare']) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        sys.stdout.write('\n')
+
+        for line in compare(results, baseline):
+            sys.stdout.write(line + '\n')
+
+    if args['json'] is not None:
+        with open(args['json'], 'w') as json_file:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'results': results}, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
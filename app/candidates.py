@@ -0,0 +1,32 @@
+# file:     candidates.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# Candidate store:  every cell keeps its permissible entries as a
+#                   9-bit mask, bit k standing for the number k + 1.
+#                   The 81 masks of a puzzle live in one array('H').
+
+from array import array
+
+
+ALL = 0x1FF
+
+BITS = tuple(1 << k for k in range(9))
+
+POPCOUNT = bytes(bin(mask).count('1') for mask in range(ALL + 1))
+
+# The number held by a single bit mask, 0 for any other mask.
+NUMBER = bytes(mask.bit_length() if POPCOUNT[mask] == 1 else 0
+               for mask in range(ALL + 1))
+
+# The numbers (1-9) held by each mask, in increasing order.
+NUMBERS = tuple(tuple(k + 1 for k in range(9) if mask & BITS[k])
+                for mask in range(ALL + 1))
+
+
+def new_candidates(mask=ALL):
+    """
+    Returns a fresh store of 81 cells all holding mask.
+    """
+
+    return array('H', [mask]) * 81
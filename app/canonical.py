@@ -0,0 +1,305 @@
+# file:     canonical.py
+# author:   Adam Felix
+# help:     Mathematics of Sudoku (Bertram Felgenhauer and Frazer Jarvis)
+
+# Canonical form:   relabeling the numbers, transposing the grid, and
+#                   permuting the bands, the stacks, the rows of a band
+#                   and the columns of a stack all turn a puzzle into an
+#                   equivalent one, with the solution carried along.
+#                   The canonical form is the least of them, comparing
+#                   first where the blanks are (row by row, clues
+#                   before blanks), then the numbers, relabeled 1-9 in
+#                   order of first appearance.
+#
+# The search builds the transform a row at a time, keeping every
+# partial transform whose rows so far are the least possible.  The
+# columns are only ordered as far as the rows placed so far tell them
+# apart: each keeps a list of blocks of columns that may still come
+# in any order.
+
+import collections
+import dbm
+import itertools
+import math
+from operator import itemgetter
+
+
+# the 81 cells of the grid, and of its transpose, row by row
+_CELLS = (tuple(range(81)), tuple(9 * (cell % 9) + cell // 9 for cell in range(81)))
+
+# bytes.translate table from grid bytes to 1 for a blank, 0 for a clue
+_BLANKS = bytes([1]) + bytes(255)
+
+# puzzles keeping more partial transforms than this in a row are left
+# without a canonical form (grids with hardly any blanks or clues tie
+# almost everywhere)
+MAX_STATES = 512
+
+
+def canonical_form(grid):
+    """
+    Returns (form, cells, labels) for the 81-byte grid: form is the
+    canonical grid as bytes, cells[i] the cell of grid that cell i of
+    form comes from, and labels a bytes.translate table from the
+    numbers of grid to those of form.  Returns None if the search
+    would keep more than MAX_STATES transforms at any step.
+    """
+
+    blanks = bytes(grid).translate(_BLANKS)
+    flips = [bytes(itemgetter(*cells)(blanks)) for cells in _CELLS]
+    rows = [[flip[i:i + 9] for i in range(0, 81, 9)] for flip in flips]
+
+    best, states = None, []
+
+    for t in (0, 1):
+        for r, row in enumerate(rows[t]):
+            counts = [row[s:s + 3].count(1) for s in (0, 3, 6)]
+            key = sorted(counts)
+
+            if best is None or key < best:
+                best, states = key, []
+
+            if key == best:
+                states += [(t, (r,), blocks) for blocks in _first_blocks(row, counts)]
+
+    for k in range(1, 9):
+        best, found = None, []
+
+        for t, order, blocks in states:
+            for r in _next_rows(order):
+                value, split = _refine(rows[t][r], blocks)
+
+                if best is None or value < best:
+                    best, found = value, []
+
+                if value == best:
+                    found.append((t, order + (r,), split))
+
+                    if len(found) > MAX_STATES:
+                        return None
+
+        states = found
+
+    orders = sum(math.prod(map(math.factorial, map(len, blocks)))
+                 for _, _, blocks in states)
+
+    if orders > MAX_STATES:
+        return None
+
+    form = None
+
+    for t, order, blocks in states:
+        for parts in itertools.product(*map(itertools.permutations, blocks)):
+            columns = sum(parts, ())
+            cells = [_CELLS[t][9 * r + c] for r in order for c in columns]
+            numbers = bytes(itemgetter(*cells)(grid))
+            table = _relabel(numbers)
+            candidate = numbers.translate(table)
+
+            if form is None or candidate < form:
+                form, best_cells, labels = candidate, cells, table
+
+    return form, tuple(best_cells), labels
+
+
+def restore(solution, cells, labels):
+    """
+    Carries a solution of the canonical form back to the grid that
+    canonical_form returned cells and labels for.
+    """
+
+    numbers = bytes(solution).translate(bytes.maketrans(labels[1:10], bytes(range(1, 10))))
+    grid = bytearray(81)
+
+    for i, cell in enumerate(cells):
+        grid[cell] = numbers[i]
+
+    return grid
+
+
+def _first_blocks(row, counts):
+    """
+    The column blocks putting the clues of the first row (1 for a
+    blank, 0 for a clue) as early as they can go: stacks by number of
+    blanks, clues before blanks inside a stack.  One list of blocks
+    for every way of ordering stacks with as many blanks.
+    """
+
+    for stacks in itertools.permutations((0, 3, 6)):
+        if [counts[s // 3] for s in stacks] != sorted(counts):
+            continue
+
+        blocks = []
+
+        for s in stacks:
+            blocks += [c for c in (tuple(c for c in range(s, s + 3) if row[c] == 0),
+                                   tuple(c for c in range(s, s + 3) if row[c] == 1))
+                       if c]
+
+        yield tuple(blocks)
+
+
+def _next_rows(order):
+    """
+    The rows that may follow order: the rest of its last band, or the
+    first row of a band not used yet.
+    """
+
+    if len(order) % 3:
+        band = order[-1] // 3 * 3
+        return [r for r in range(band, band + 3) if r not in order]
+
+    bands = {r // 3 for r in order}
+    return [r for r in range(9) if r // 3 not in bands]
+
+
+def _refine(row, blocks):
+    """
+    The least value row (1 for a blank, 0 for a clue) takes with the
+    columns in blocks, and the blocks split so they keep it.
+    """
+
+    value, split = [], []
+
+    for block in blocks:
+        if len(block) == 1:
+            value.append(row[block[0]])
+            split.append(block)
+            continue
+
+        clues = tuple(c for c in block if row[c] == 0)
+        empty = tuple(c for c in block if row[c] == 1)
+
+        value += [0] * len(clues) + [1] * len(empty)
+        split += [c for c in (clues, empty) if c]
+
+    return value, tuple(split)
+
+
+def _relabel(numbers):
+    """
+    bytes.translate table numbering the numbers 1-9 in order of first
+    appearance in numbers, the missing ones last.
+    """
+
+    seen = [n for n in dict.fromkeys(numbers) if n]
+    seen += [n for n in range(1, 10) if n not in seen]
+
+    table = bytearray(range(256))
+
+    for label, n in enumerate(seen, 1):
+        table[n] = label
+
+    return bytes(table)
+
+
+class SolutionCache(object):
+    """
+    Solutions by puzzle, for puzzles seen before and for any puzzle
+    equivalent to one seen before.  The last maxsize puzzles are kept
+    in memory; with a path, every canonical form also goes to a dbm
+    file there.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self.__lru = collections.OrderedDict()
+        self.__db = dbm.open(path, 'c') if path is not None else None
+        self.__last = None
+
+
+    def get(self, grid):
+        """
+        The solution of the 81-byte grid, or None if neither it nor an
+        equivalent puzzle has been put in the cache.
+        """
+
+        key = bytes(grid)
+        solution = self.__lookup(key)
+
+        if solution is None:
+            canonical = self.__canonical(key)
+
+            if canonical is not None:
+                solution = self.__lookup(canonical[0])
+
+                if solution is not None:
+                    solution = bytes(restore(solution, *canonical[1:]))
+                    self.__remember(key, solution)
+
+        if solution is None:
+            self.misses += 1
+
+        else:
+            self.hits += 1
+
+        return solution
+
+
+    def put(self, grid, solution):
+        key = bytes(grid)
+        self.__remember(key, bytes(solution))
+
+        canonical = self.__canonical(key)
+
+        if canonical is not None:
+            form, cells, labels = canonical
+            solved = bytes(itemgetter(*cells)(solution)).translate(labels)
+
+            self.__remember(form, solved)
+
+            if self.__db is not None:
+                self.__db[form] = solved
+
+
+    def close(self):
+        if self.__db is not None:
+            self.__db.close()
+            self.__db = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __canonical(self, key):
+        """
+        canonical_form of key, remembered for the put that follows a
+        missed get.
+        """
+
+        if self.__last is None or self.__last[0] != key:
+            self.__last = (key, canonical_form(key))
+
+        return self.__last[1]
+
+
+    def __lookup(self, key):
+        solution = self.__lru.get(key)
+
+        if solution is not None:
+            self.__lru.move_to_end(key)
+            return solution
+
+        if self.__db is not None:
+            solution = self.__db.get(key)
+
+            if solution is not None:
+                self.__remember(key, solution)
+
+        return solution
+
+
+    def __remember(self, key, solution):
+        self.__lru[key] = solution
+        self.__lru.move_to_end(key)
+
+        while len(self.__lru) > self.maxsize:
+            self.__lru.popitem(last=False)
@@ -10,3 +10,5 @@ BUTTON_COLUMNS = tuple(range(0, 10, 2))
 BUTTON_ROWS = (18,) * 5
 NO_SHIFT = 96
 HIGHLIGHT_THICKNESS = 1
+FRAME_MS = 16
+SOLVE_CHUNK = 20
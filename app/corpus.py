@@ -0,0 +1,202 @@
+# file:     corpus.py
+# author:   Adam Felix
+# help:     mmap (Python docs)
+
+# Puzzle corpus:    a puzzle file is memory-mapped and only the puzzle
+#                   asked for is read and decoded.  A file of one-line
+#                   puzzles of the same width needs no index: puzzle i
+#                   starts at i * width.  Any other file gets an index
+#                   of the offset of each puzzle, cached next to it in
+#                   <file>.idx and rebuilt when the file changes.
+
+import array
+import mmap
+import os
+from stat import S_ISREG
+
+from sudokugame import _SKIPPED, SudokuError, parse_buffer, puzzle_offsets
+
+
+INDEX_VERSION = 1
+
+# index header: version, size and mtime of the puzzle file
+HEADER = 3
+
+# files smaller than this are indexed in memory, without a cache file
+CACHE_SIZE = 1 << 20
+
+
+class PuzzleCorpus(object):
+    """
+    Random access to the puzzles of a file: corpus[i] is the i-th
+    puzzle as a SudokuBoard, ready for SudokuGame.load.
+    """
+
+    def __init__(self, puzzle_file, index_path=None):
+        """
+        puzzle_file is a path or a file opened in binary mode; the
+        index is cached at index_path, by default the file name plus
+        '.idx'.
+        """
+
+        if isinstance(puzzle_file, (str, os.PathLike)):
+            with open(puzzle_file, 'rb') as opened_file:
+                stat = self.__map_file(opened_file)
+
+        else:
+            stat = self.__map_file(puzzle_file)
+
+        self.__stat = (INDEX_VERSION, stat.st_size, stat.st_mtime_ns)
+        self.__index_map = None
+        self.__width = self.__fixed_width()
+
+        if self.__width:
+            self.__length = -(-len(self.__map) // self.__width)
+
+        else:
+            if index_path is None and isinstance(self.name, str):
+                index_path = self.name + '.idx'
+
+            self.__index = self.__load_index(index_path)
+            self.__length = len(self.__index) - 1
+
+
+    def __len__(self):
+        return self.__length
+
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.__length
+
+        if not 0 <= i < self.__length:
+            raise IndexError('puzzle index out of range')
+
+        if self.__width:
+            start = i * self.__width
+            end = start + self.__width
+
+        else:
+            start, end = self.__index[i], self.__index[i + 1]
+
+        for board in parse_buffer(self.__map[start:end]):
+            return board
+
+        raise SudokuError('Puzzle %d of the corpus holds no puzzle.' % i)
+
+
+    def __iter__(self):
+        return parse_buffer(self.__map)
+
+
+    def close(self):
+        if self.__index_map is not None:
+            self.__index.release()
+            self.__index_map.close()
+            self.__index_map = None
+
+        if isinstance(self.__map, mmap.mmap):
+            self.__map.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __map_file(self, puzzle_file):
+        self.name = getattr(puzzle_file, 'name', None)
+
+        try:
+            stat = os.fstat(puzzle_file.fileno())
+
+        except (OSError, ValueError):
+            stat = None
+
+        if stat is None or not S_ISREG(stat.st_mode):
+            raise SudokuError('A puzzle corpus must be a regular file.')
+
+        self.__map = b''
+
+        if stat.st_size:
+            self.__map = mmap.mmap(puzzle_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return stat
+
+
+    def __fixed_width(self):
+        """
+        The width of the records if the file holds nothing but one-line
+        puzzles of the same width, else 0.  A record starting with a
+        char parse_buffer skips ('#' or '[') is not a puzzle, and makes
+        the file need an index.
+        """
+
+        end = self.__map.find(b'\n')
+
+        if end < 0 or len(self.__map[:end].strip()) != 81:
+            return 0
+
+        width, size = end + 1, len(self.__map)
+
+        if size % width not in (0, width - 1):
+            return 0
+
+        if self.__map[end::width].count(b'\n') != size // width:
+            return 0
+
+        if any(c in self.__map[::width] for c in _SKIPPED):
+            return 0
+
+        return width
+
+
+    def __load_index(self, index_path):
+        """
+        The offset of every puzzle plus the size of the file, from the
+        cache at index_path if it is still valid.
+        """
+
+        if index_path is not None:
+            try:
+                with open(index_path, 'rb') as index_file:
+                    index_map = mmap.mmap(index_file.fileno(), 0,
+                                          access=mmap.ACCESS_READ)
+
+                view = memoryview(index_map).cast('Q')
+
+                if tuple(view[:HEADER]) == self.__stat:
+                    self.__index_map = index_map
+                    index = view[HEADER:]
+                    view.release()
+
+                    return index
+
+                view.release()
+                index_map.close()
+
+            except (OSError, TypeError, ValueError):
+                pass
+
+        index = array.array('Q', puzzle_offsets(self.__map))
+        index.append(len(self.__map))
+
+        if index_path is not None and len(self.__map) >= CACHE_SIZE:
+            self.__save_index(index_path, index)
+
+        return index
+
+
+    def __save_index(self, index_path, index):
+        try:
+            with open(index_path + '.tmp', 'wb') as index_file:
+                array.array('Q', self.__stat).tofile(index_file)
+                index.tofile(index_file)
+
+            os.replace(index_path + '.tmp', index_path)
+
+        except OSError:
+            pass
@@ -0,0 +1,264 @@
+# file:     dlx.py
+# author:   Adam Felix
+# help:     Dancing Links (Donald Knuth)
+
+# Exact cover:  every (cell, number) pair is a row of a 729 x 324
+#               matrix whose columns are the four constraints: each
+#               cell holds one number, and each row, column and box
+#               holds each number once.  Algorithm X walks the matrix
+#               with dancing links, always on the column with the
+#               fewest rows left.
+
+
+from units import BOX, COL, ROW
+
+
+N_COLUMNS = 4 * 81
+
+
+class DancingLinks(object):
+    """
+    The constraint matrix as a node arena of parallel lists.  Index 0
+    is the root, 1-324 the column headers, then four nodes per row.
+    Every cover is undone before solve returns, or the matrix built
+    again if solve is interrupted, so one arena serves any number of
+    puzzles.
+    """
+
+    def __init__(self):
+        columns = range(N_COLUMNS + 1)
+
+        self.left = [c - 1 for c in columns]
+        self.right = [c + 1 for c in columns]
+        self.up = list(columns)
+        self.down = list(columns)
+        self.column = list(columns)
+        self.row = [-1] * (N_COLUMNS + 1)
+        self.size = [0] * (N_COLUMNS + 1)
+
+        self.left[0] = N_COLUMNS
+        self.right[N_COLUMNS] = 0
+
+        self.row_nodes = []
+        self.n_nodes = 0
+
+        for r in range(729):
+            cell, number = r // 9, r % 9
+
+            self.__add_row(r, (1 + cell,
+                               1 + 81 + 9 * ROW[cell] + number,
+                               1 + 162 + 9 * COL[cell] + number,
+                               1 + 243 + 9 * BOX[cell] + number))
+
+
+    def __add_row(self, r, columns):
+        first = len(self.left)
+        self.row_nodes.append(first)
+
+        for k, c in enumerate(columns):
+            node = first + k
+
+            self.left.append(first + (k - 1) % 4)
+            self.right.append(first + (k + 1) % 4)
+            self.up.append(self.up[c])
+            self.down.append(c)
+            self.down[self.up[c]] = node
+            self.up[c] = node
+            self.column.append(c)
+            self.row.append(r)
+            self.size[c] += 1
+
+
+    def __cover(self, c):
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+
+        i = down[c]
+
+        while i != c:
+            j = right[i]
+
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+
+            i = down[i]
+
+
+    def __uncover(self, c):
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+
+        i = up[c]
+
+        while i != c:
+            j = left[i]
+
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+
+            i = up[i]
+
+        right[left[c]] = c
+        left[right[c]] = c
+
+
+    def __select(self, node):
+        self.__cover(self.column[node])
+
+        j = self.right[node]
+
+        while j != node:
+            self.__cover(self.column[j])
+            j = self.right[j]
+
+
+    def __unselect(self, node):
+        j = self.left[node]
+
+        while j != node:
+            self.__uncover(self.column[j])
+            j = self.left[j]
+
+        self.__uncover(self.column[node])
+
+
+    def __is_free(self, node):
+        """
+        True if none of the columns of the row at node is covered yet.
+        """
+
+        j = node
+
+        while True:
+            c = self.column[j]
+
+            if self.right[self.left[c]] != c:
+                return False
+
+            j = self.right[j]
+
+            if j == node:
+                return True
+
+
+    def solve(self, grid):
+        """
+        Solves the flat 81-entry grid (0 for blanks).  Returns the
+        completed grid as a list, or None if the puzzle has no
+        solution.
+        """
+
+        self.n_nodes = 0
+
+        given, rows, solved = [], [], None
+
+        try:
+            for cell, value in enumerate(grid):
+                if value != 0:
+                    node = self.row_nodes[9 * cell + value - 1]
+
+                    if not self.__is_free(node):
+                        break
+
+                    self.__select(node)
+                    given.append(node)
+                    rows.append(9 * cell + value - 1)
+
+            else:
+                if self.__search(rows):
+                    solved = [0] * 81
+
+                    for r in rows:
+                        solved[r // 9] = r % 9 + 1
+
+        except BaseException:
+            # an exception (a timeout, KeyboardInterrupt) can leave the
+            # links half covered, even inside a single __cover: the
+            # matrix is built again rather than unwound
+            self.__init__()
+            raise
+
+        for node in reversed(given):
+            self.__unselect(node)
+
+        return solved
+
+
+    def __search(self, rows):
+        right, down, size = self.right, self.down, self.size
+
+        if right[0] == 0:
+            return True
+
+        c, j = right[0], right[0]
+
+        while j != 0:
+            if size[j] < size[c]:
+                c = j
+
+                if size[c] <= 1:
+                    break
+
+            j = right[j]
+
+        if size[c] == 0:
+            return False
+
+        self.__cover(c)
+
+        found = False
+        r = down[c]
+
+        while r != c:
+            self.n_nodes += 1
+            rows.append(self.row[r])
+
+            j = right[r]
+
+            while j != r:
+                self.__cover(self.column[j])
+                j = right[j]
+
+            found = self.__search(rows)
+
+            j = self.left[r]
+
+            while j != r:
+                self.__uncover(self.column[j])
+                j = self.left[j]
+
+            if found:
+                break
+
+            rows.pop()
+            r = down[r]
+
+        self.__uncover(c)
+
+        return found
+
+
+_links = None
+
+
+def dancing_links():
+    """
+    Returns the shared arena, building the constraint matrix on the
+    first call only.
+    """
+
+    global _links
+
+    if _links is None:
+        _links = DancingLinks()
+
+    return _links
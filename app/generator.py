@@ -3,3 +3,168 @@
 # help:     Sudoku Solving with C (Giuluo Zambon)
 #           and
 #           Programming Sudoku (Wei-Meng Lee)
+
+# Generator:    fill a random grid, then take clues away in random
+#               order for as long as the puzzle keeps a unique
+#               solution.  A clue can only be removed if no solution
+#               puts another value in its cell, so every removal is
+#               checked with a search for one such solution instead
+#               of a full count.  The board is built once per removal
+#               and every search is rolled back from the trail.
+
+
+import argparse
+import random
+import sys
+
+from solver import SudokuSolver
+from sudokugame import SudokuBoard, SudokuError
+
+
+SYMMETRIES = {
+    'none': lambda cell: (cell,),
+    'rotational': lambda cell: tuple(sorted({cell, 80 - cell})),
+    'mirror': lambda cell: tuple(sorted({cell, cell // 9 * 9 + 8 - cell % 9})),
+    'diagonal': lambda cell: tuple(sorted({cell, cell % 9 * 9 + cell // 9})),
+}
+
+
+class SudokuGenerator(object):
+    """
+    Makes puzzles with a unique solution, reusing one solver for
+    every uniqueness check.
+    """
+
+    def __init__(self, seed=None, clues=17, symmetry='none'):
+        if symmetry not in SYMMETRIES:
+            raise SudokuError('Symmetry must be one of %s.' % ', '.join(SYMMETRIES))
+
+        self.random = random.Random(seed)
+        self.clues = clues
+        self.symmetry = SYMMETRIES[symmetry]
+        self.solver = SudokuSolver()
+
+
+    def __full_grid(self):
+        """
+        Fills the three boxes on the main diagonal at random, since
+        they do not see each other, and lets the solver do the rest.
+        """
+
+        grid = ['0'] * 81
+
+        for box in (0, 4, 8):
+            numbers = self.random.sample('123456789', 9)
+
+            for i in range(9):
+                grid[9 * (box // 3 * 3 + i // 3) + box % 3 * 3 + i % 3] = numbers[i]
+
+        self.solver.load(SudokuBoard.from_string(''.join(grid)))
+
+        return list(self.solver.solution())
+
+
+    def __is_unique_without(self, board, cells):
+        """
+        True if board, which has a unique solution with cells filled
+        in, keeps it once they are blanked.  The cells are blanked in
+        board.grid, and filled in again if not.
+        """
+
+        grid = board.grid
+        values = [grid[cell] for cell in cells]
+
+        for cell in cells:
+            grid[cell] = 0
+
+        self.solver.load(board, solve=False)
+
+        unique = all(self.solver.count_completions(
+                             1, excluding=(cell // 9, cell % 9, value)) == 0
+                     for cell, value in zip(cells, values))
+
+        if not unique:
+            for cell, value in zip(cells, values):
+                grid[cell] = value
+
+        return unique
+
+
+    def generate(self):
+        """
+        Returns a new puzzle as an 81-char line.  It stops removing
+        clues once it is down to self.clues, or when no clue can be
+        taken away without losing uniqueness.
+        """
+
+        board = SudokuBoard.from_string(''.join(self.__full_grid()))
+        n_clues = 81
+
+        cells = list(range(81))
+        self.random.shuffle(cells)
+
+        tried = set()
+
+        for cell in cells:
+            if n_clues <= self.clues:
+                break
+
+            if cell in tried:
+                continue
+
+            orbit = self.symmetry(cell)
+            tried.update(orbit)
+
+            if self.__is_unique_without(board, orbit):
+                n_clues -= len(orbit)
+
+        return board.to_string()
+
+
+    def generate_many(self, n):
+        for _ in range(n):
+            yield self.generate()
+
+
+def parse_arguments():
+    """
+    Parses arguments of the form:
+        generator.py [-n <count>] [--seed <seed>] [--clues <count>]
+                     [--symmetry <symmetry>]
+    """
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n',
+                            help='Number of puzzles',
+                            type=int,
+                            default=1)
+    arg_parser.add_argument('--seed',
+                            help='Random seed',
+                            type=int,
+                            default=None)
+    arg_parser.add_argument('--clues',
+                            help='Target number of clues',
+                            type=int,
+                            default=17)
+    arg_parser.add_argument('--symmetry',
+                            help='Symmetry of the clues',
+                            type=str,
+                            choices=SYMMETRIES,
+                            default='none')
+
+    return vars(arg_parser.parse_args())
+
+
+def main():
+    args = parse_arguments()
+
+    generator = SudokuGenerator(seed=args['seed'],
+                                clues=args['clues'],
+                                symmetry=args['symmetry'])
+
+    for puzzle in generator.generate_many(args['n']):
+        sys.stdout.write(puzzle + '\n')
+
+
+if __name__ == '__main__':
+    main()
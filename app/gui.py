@@ -3,13 +3,47 @@
 # help:     new coder tutorials
 
 import argparse
+import queue
+import threading
 import time
 import tkinter as tk
 
-from sudokugame import SudokuGame
+from history import MoveHistory
+from solver import SudokuSolver
+from sudokugame import SudokuBoard, SudokuGame
 from constants import *
 
 
+class RenderCache(object):
+    """
+    The options last sent to Tk for each item of a canvas.  Only the
+    options whose value changed since are sent again, each Tk call
+    being a round trip to the Tcl interpreter (and the X server).
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.__applied = {}
+
+
+    def itemconfig(self, item, **options):
+        applied = self.__applied.setdefault(item, {})
+        changed = {key: value for key, value in options.items()
+                   if key not in applied or applied[key] != value}
+
+        if changed:
+            self.canvas.itemconfig(item, **changed)
+            applied.update(changed)
+
+
+    def coords(self, item, *coords):
+        applied = self.__applied.setdefault(item, {})
+
+        if applied.get('coords') != coords:
+            self.canvas.coords(item, *coords)
+            applied['coords'] = coords
+
+
 class GridUI(object):
     """
     The main drawing mechanics for drawing the original sudoku
@@ -301,6 +335,12 @@ class SudokuUI(tk.Frame):
         self.parent = parent
         self.__start_time = time.time()
 
+        self.__dirty = set()
+        self.__flush_id = None
+        self.__last_flush = 0.0
+
+        self.__solving = False
+
         tk.Frame.__init__(self, parent)
 
         self.__initUI()
@@ -348,11 +388,17 @@ class SudokuUI(tk.Frame):
         self.__set_drawing_puzzle_rectangles()
         self.__set_drawing_shadow_puzzle_rectangles()
 
-        self.__draw_puzzle()
         self.__draw_grid(self.canvas)
+        self.__draw_grid(self.shadow)
+
+        self.__make_cursor(self.canvas)
+        self.__make_cursor(self.shadow)
+
+        self.canvas.lift('numbers')
+        self.shadow.lift('numbers')
 
+        self.__draw_puzzle()
         self.__draw_shadow_puzzle()
-        self.__draw_grid(self.shadow)
 
         self.canvas.bind('<Button-1>', self.__cell_clicked)
         self.canvas.bind('<Key>', self.__key_pressed)
@@ -388,9 +434,9 @@ class SudokuUI(tk.Frame):
 
         text = ['Solve Puzzle', 'Solve Row', 'Solve Column',
                 'Solve Box', 'Solve Cell']
-        commands = [self.__clear_puzzle, self.__clear_row,
-                    self.__clear_column, self.__clear_box,
-                    self.__clear_box]
+        commands = [self.__solve_puzzle, self.__solve_row,
+                    self.__solve_column, self.__solve_box,
+                    self.__solve_cell]
         widths = [BUTTON_WIDTH] * 5
         columns = range(0, 10, 2)
         rows = [20] * 5
@@ -423,27 +469,20 @@ class SudokuUI(tk.Frame):
 
 
     def __make_log(self):
-        self.log = []
+        self.log = MoveHistory()
 
 
-    def log_move(self, row, column, number):
+    def log_move(self, row, column, number, previous, reason=None):
 
         """
-
+        Records number put in (row, column) over previous, newest
+        first in the activity log.
         """
 
-        move_type = 'Entered' if number != 0 else 'Deleted'
-
-        string = '%s %d in row %d column %d' % (move_type,
-                                                number,
-                                                row + 1,
-                                                column + 1)
-
-        log_number = (row + 1) * 100 + (column * 1) * 10 + number
+        move = self.log.record(row, column, number, previous, reason)
 
-        if not self.log or log_number != self.log[-1]:
-            self.log.append(log_number)
-            self.listbox.insert(0, string)
+        if move is not None:
+            self.listbox.insert(0, str(move))
 
 
 
@@ -513,30 +552,21 @@ class SudokuUI(tk.Frame):
                 elif answer != 0:
                     bgcolor, color = 'cyan', 'black'
 
-                elif self.canvas.row == i or self.canvas.col == j:
-                    bgcolor, color = 'light cyan', 'black'
-
-                elif self.canvas.row // 3 == i // 3 and self.canvas.col // 3 == j // 3:
-                    bgcolor, color = 'light cyan', 'black'
-
                 else:
-                    bgcolor, color = 'white', 'black'
+                    bgcolor, color = '', 'black'
 
-                self.canvas.itemconfig(self.canvas.rectangles[i][j],
-                                       fill=bgcolor,
-                                       outline=bgcolor,
-                                       width=1)
+                self.canvas.cache.itemconfig(self.canvas.rectangles[i][j],
+                                             fill=bgcolor,
+                                             outline=bgcolor,
+                                             width=1)
 
-                self.canvas.itemconfig(self.canvas.text[i][j],
-                                       text=answer if answer != 0 else '',
-                                       fill=color)
+                self.canvas.cache.itemconfig(self.canvas.text[i][j],
+                                             text=answer if answer != 0 else '',
+                                             fill=color)
 
         self.__draw_cursor(self.canvas)
 
 
-        self.canvas.lift('numbers')
-
-
     def __draw_shadow_puzzle(self):
 
         for i in range(SUDOKU_SIZE):
@@ -554,22 +584,13 @@ class SudokuUI(tk.Frame):
 
                         if original == 0:
 
-                            if answer != 0:
-                                bgcolor = 'cyan'
-                                color = 'black'
-
-                            elif self.shadow.row == i or self.shadow.col == j:
-                                bgcolor = 'light cyan'
+                            bgcolor = 'cyan' if answer != 0 else ''
+                            color = 'black'
 
-                            elif self.shadow.row // 3 == i // 3 and self.shadow.col // 3 == j // 3:
-                                bgcolor = 'light cyan'
+                            if not self.game.get_entry(i, j, number - 1):
+                                number = ''
 
-                            else:
-                                bgcolor = 'white'
-
-                            color = 'black' if self.game.get_entry(i, j, number - 1) else bgcolor
-
-                            if self.game.get_entry(i, j, number - 1) >= 2:
+                            elif self.game.get_entry(i, j, number - 1) >= 2:
 
                                 if self.game.get_entry(i, j, number - 1) == 3:
                                     color = 'red'
@@ -583,20 +604,17 @@ class SudokuUI(tk.Frame):
                             color = 'white' if ii == jj == 1 else 'black'
                             font = ('', 25) if ii == jj == 1 else font
 
-                        self.shadow.itemconfig(self.shadow.rectangles[i][j][ii][jj],
-                                               fill=bgcolor,
-                                               outline=bgcolor)
+                        self.shadow.cache.itemconfig(self.shadow.rectangles[i][j][ii][jj],
+                                                     fill=bgcolor,
+                                                     outline=bgcolor)
 
-                        self.shadow.itemconfig(self.shadow.text[i][j][ii][jj],
-                                               text=number,
-                                               tags='numbers',
-                                               fill=color,
-                                               font=font)
+                        self.shadow.cache.itemconfig(self.shadow.text[i][j][ii][jj],
+                                                     text=number,
+                                                     fill=color,
+                                                     font=font)
 
         self.__draw_cursor(self.shadow)
 
-        self.shadow.lift('numbers')
-
 
     def __set_cursor(self):
         if (self.canvas.row, self.canvas.col) == (-1, -1):
@@ -652,6 +670,8 @@ class SudokuUI(tk.Frame):
 
     def __set_drawing_puzzle_rectangles(self):
 
+        self.canvas.cache = RenderCache(self.canvas)
+        self.__make_highlights(self.canvas)
         self.canvas.rectangles = []
         self.canvas.text = []
 
@@ -676,6 +696,8 @@ class SudokuUI(tk.Frame):
 
     def __set_drawing_shadow_puzzle_rectangles(self):
 
+        self.shadow.cache = RenderCache(self.shadow)
+        self.__make_highlights(self.shadow)
         self.shadow.rectangles = []
         self.shadow.text = []
 
@@ -705,17 +727,109 @@ class SudokuUI(tk.Frame):
 
 
     def draw_puzzles(self):
-        self.__draw_puzzle()
-        self.__draw_shadow_puzzle()
+        self.__schedule('puzzle', 'shadow')
 
 
-    def __draw_cursor(self, grid):
+    def draw_shadow_puzzle(self):
+        self.__schedule('shadow')
+
+
+    def __schedule(self, *parts):
+        """
+        Marks parts ('puzzle', 'shadow', 'cursors') for redrawing.
+        The redraw waits for Tk to be idle, and for FRAME_MS since the
+        last one, so a burst of changes comes out as a single repaint.
+        """
+
+        self.__dirty.update(parts)
+
+        if self.__flush_id is None:
+            wait = int(1000 * (self.__last_flush - time.time())) + FRAME_MS
+
+            if wait > 0:
+                self.__flush_id = self.after(wait, self.__scheduled_flush)
+
+            else:
+                self.__flush_id = self.after_idle(self.__scheduled_flush)
+
+
+    def __scheduled_flush(self):
+        self.__flush_id = None
+        self.flush()
+
+
+    def flush(self):
+        """
+        Redraws now whatever was marked for redrawing.
+        """
+
+        if self.__flush_id is not None:
+            self.after_cancel(self.__flush_id)
+            self.__flush_id = None
+
+        dirty, self.__dirty = self.__dirty, set()
+
+        if 'puzzle' in dirty:
+            self.__draw_puzzle()
+
+        if 'shadow' in dirty:
+            self.__draw_shadow_puzzle()
+
+        if 'cursors' in dirty:
+            self.__draw_cursor(self.canvas)
+            self.__draw_cursor(self.shadow)
 
+        self.__last_flush = time.time()
+
+
+    def __make_highlights(self, grid):
         """
-        Highlight the particular cell that the user has clicked on.
+        Makes the white board and, over it, the light cyan rectangles
+        for the row, the column and the box of the cursor.  They lie
+        under the cells, and the empty cells are see-through, so
+        moving the cursor only moves these three.
         """
 
-        grid.delete('cursor')
+        grid.create_rectangle(MARGIN,
+                              MARGIN,
+                              SUDOKU_WIDTH - MARGIN,
+                              SUDOKU_HEIGHT - MARGIN,
+                              fill='white',
+                              outline='')
+
+        grid.highlights = [grid.create_rectangle(0,
+                                                 0,
+                                                 0,
+                                                 0,
+                                                 fill='light cyan',
+                                                 outline='',
+                                                 state=tk.HIDDEN)
+                           for _ in range(3)]
+
+
+    def __make_cursor(self, grid):
+        """
+        Makes the cursor rectangle of grid, hidden until it is drawn.
+        """
+
+        grid.cursor = grid.create_rectangle(0,
+                                            0,
+                                            0,
+                                            0,
+                                            outline='dark cyan',
+                                            tags='cursor',
+                                            width=3,
+                                            state=tk.HIDDEN)
+
+
+    def __draw_cursor(self, grid):
+
+        """
+        Highlight the particular cell that the user has clicked on,
+        moving the cursor rectangle there and the highlights to its
+        row, column and box.  This takes the same few Tk calls
+        wherever the cursor goes.
+        """
 
         if grid.row >= 0 and grid.col >=0:
             x0 = MARGIN + grid.col * SIDE + 1
@@ -723,13 +837,36 @@ class SudokuUI(tk.Frame):
             x1 = MARGIN + (grid.col + 1) * SIDE - 1
             y1 = MARGIN + (grid.row + 1) * SIDE - 1
 
-            grid.create_rectangle(x0,
-                                  y0,
-                                  x1,
-                                  y1,
-                                  outline='dark cyan',
-                                  tags='cursor',
-                                  width=3)
+            grid.cache.coords(grid.cursor, x0, y0, x1, y1)
+            grid.cache.itemconfig(grid.cursor, state=tk.NORMAL)
+
+            box_row = grid.row // SUDOKU_BOX_SIZE * SUDOKU_BOX_SIZE
+            box_col = grid.col // SUDOKU_BOX_SIZE * SUDOKU_BOX_SIZE
+
+            spans = [(grid.row, 0, grid.row + 1, SUDOKU_SIZE),
+                     (0, grid.col, SUDOKU_SIZE, grid.col + 1),
+                     (box_row, box_col, box_row + SUDOKU_BOX_SIZE, box_col + SUDOKU_BOX_SIZE)]
+
+            for highlight, (row0, col0, row1, col1) in zip(grid.highlights, spans):
+                grid.cache.coords(highlight,
+                                  MARGIN + col0 * SIDE,
+                                  MARGIN + row0 * SIDE,
+                                  MARGIN + col1 * SIDE,
+                                  MARGIN + row1 * SIDE)
+                grid.cache.itemconfig(highlight, state=tk.NORMAL)
+
+        else:
+            for item in [grid.cursor] + grid.highlights:
+                grid.cache.itemconfig(item, state=tk.HIDDEN)
+
+
+    def draw_cursors(self):
+        """
+        Redraws only the cursors and highlights, for when nothing but
+        the cursor moved.
+        """
+
+        self.__schedule('cursors')
 
     def __draw_shadow_cursor(self):
         """
@@ -830,23 +967,105 @@ class SudokuUI(tk.Frame):
 
 
     def __solve_puzzle(self):
-        pass
+        self.solve('puzzle')
 
 
     def __solve_row(self):
-        pass
+        self.solve('row')
 
 
     def __solve_column(self):
-        pass
+        self.solve('column')
 
 
     def __solve_box(self):
-        pass
+        self.solve('box')
 
 
     def __solve_cell(self):
-        pass
+        self.solve('cell')
+
+
+    def solve(self, scope):
+        """
+        Solves the start puzzle and plays the solver's placements in
+        scope ('puzzle', or the 'row', 'column', 'box' or 'cell' of
+        the cursor) into the board and the activity log as moves.
+        The solver runs in a thread and its trace is played back in
+        chunks of SOLVE_CHUNK steps per frame, so Tk never waits on
+        it.
+        """
+
+        if self.game or self.__solving:
+            return
+
+        row, col = self.canvas.row, self.canvas.col
+
+        if scope != 'puzzle' and (row < 0 or col < 0):
+            return
+
+        box_row, box_col = row // SUDOKU_BOX_SIZE, col // SUDOKU_BOX_SIZE
+
+        cells = {9 * i + j
+                 for i in range(SUDOKU_SIZE)
+                 for j in range(SUDOKU_SIZE)
+                 if scope == 'puzzle'
+                 or scope == 'row' and i == row
+                 or scope == 'column' and j == col
+                 or scope == 'box' and (i // SUDOKU_BOX_SIZE, j // SUDOKU_BOX_SIZE) == (box_row, box_col)
+                 or scope == 'cell' and (i, j) == (row, col)}
+
+        board = SudokuBoard()
+        board.grid[:] = self.game.start_puzzle
+
+        steps = queue.Queue()
+        solver = threading.Thread(target=self.__run_solver, args=(board, steps), daemon=True)
+
+        self.__solving = True
+        solver.start()
+        self.after(FRAME_MS, self.__play_steps, steps, cells)
+
+
+    def __run_solver(self, board, steps):
+        """
+        Solver thread: puts every step of the trace on steps, then
+        None.  Nothing here may touch Tk.
+        """
+
+        try:
+            SudokuSolver(trace=steps.put).load(board)
+
+        finally:
+            steps.put(None)
+
+
+    def __play_steps(self, steps, cells):
+        for _ in range(SOLVE_CHUNK):
+            try:
+                step = steps.get_nowait()
+
+            except queue.Empty:
+                break
+
+            if step is None:
+                self.__solving = False
+                self.draw_puzzles()
+
+                if self.game.check_win():
+                    self.flush()
+                    self.__draw_victory()
+
+                return
+
+            name, row, col, number = step
+
+            if number > 0 and 9 * row + col in cells:
+                previous = self.game.get_puzzle_entry(row, col)
+                self.game.set_puzzle_entry(row, col, number)
+                self.log_move(row, col, number, previous, name)
+
+        self.draw_puzzles()
+        self.after(FRAME_MS, self.__play_steps, steps, cells)
 
    # Event handlers
 
@@ -866,7 +1085,7 @@ class SudokuUI(tk.Frame):
                 self.__set_rows_and_cols(row - self.canvas.row,
                                          col - self.canvas.col)
 
-        self.draw_puzzles()
+        self.draw_cursors()
 
 
     def __key_pressed(self, event):
@@ -880,29 +1099,33 @@ class SudokuUI(tk.Frame):
             if event.keysym in '123456789':
                 number = int(event.keysym)
 
+                previous = self.game.get_puzzle_entry(row, column)
+
                 if self.game.get_entry(row, column, number - 1) == 1:
 
                     self.game.set_puzzle_entry(row, column, number)
-                    self.log_move(row, column, number)
+                    self.log_move(row, column, number, previous)
 
                 elif self.game.get_entry(row, column, number - 1) in [0, 2]:
                     contradictions = self.__offending_entries(number)
 
                     if contradictions:
+                        self.flush()
+
                         for _row, _col in contradictions:
-                            self.canvas.itemconfig(self.canvas.rectangles[_row][_col],
-                                                   fill='yellow',
-                                                   outline='yellow',
-                                                   width=1)
+                            self.canvas.cache.itemconfig(self.canvas.rectangles[_row][_col],
+                                                         fill='yellow',
+                                                         outline='yellow',
+                                                         width=1)
 
-                            self.canvas.itemconfig(self.canvas.text[_row][_col],
-                                                   fill='red')
+                            self.canvas.cache.itemconfig(self.canvas.text[_row][_col],
+                                                         fill='red')
                         self.canvas.update()
                         time.sleep(0.2)
 
                     else:
                         self.game.set_puzzle_entry(row, column, number)
-                        self.log_move(row, column, number)
+                        self.log_move(row, column, number, previous)
 
             elif event.keysym in ['Left', 'Right', 'Up', 'Down']:
 
@@ -924,13 +1147,16 @@ class SudokuUI(tk.Frame):
                 while self.game.get_start_puzzle_entry(row, column) != 0:
                     self.__set_rows_and_cols(dx, dy)
 
+                self.draw_cursors()
+                return
+
             elif event.keysym == 'BackSpace':
-                char = str(self.game.get_puzzle_entry(row, column))
+                previous = self.game.get_puzzle_entry(row, column)
 
-                if char != '0':
+                if previous != 0:
 
                     self.game.set_puzzle_entry(row, column, 0)
-                    self.log_move(row, column, number)
+                    self.log_move(row, column, 0, previous)
 
             self.draw_puzzles()
 
@@ -964,7 +1190,7 @@ class SudokuUI(tk.Frame):
                 self.__set_shadow_rows_and_cols(row - self.shadow.row,
                                                 col - self.shadow.col)
 
-        self.__draw_shadow_puzzle()
+        self.draw_shadow_puzzle()
 
 
     def __shadow_key_pressed(self, event):
@@ -1008,7 +1234,10 @@ class SudokuUI(tk.Frame):
                     while self.game.get_start_puzzle_entry(row, col) != 0:
                         self.__set_shadow_rows_and_cols(dx, dy)
 
-            self.__draw_shadow_puzzle()
+                    self.draw_cursors()
+                    return
+
+            self.draw_shadow_puzzle()
 
 
     def __toggle_subrow_and_subcol(self, row, col, number, value=-1):
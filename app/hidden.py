@@ -0,0 +1,59 @@
+# file:     hidden.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# Hidden strategy:  If n numbers of a unit fit, between them, in only
+#                   n of its cells, then those cells must hold those
+#                   numbers and every other candidate can be removed
+#                   from them.
+
+
+from itertools import combinations
+
+from candidates import ALL, BITS, POPCOUNT
+from strategies import eliminate, empty_cells, register
+from units import UNITS
+
+
+def __hidden(sudoku_game, size, name):
+    candidates = sudoku_game.game.candidates
+    steps = []
+
+    for unit in UNITS:
+        cells = empty_cells(sudoku_game, unit)
+
+        if len(cells) <= size:
+            continue
+
+        # places[k] has bit i set if number k + 1 fits in cells[i]
+        places = [0] * 9
+
+        for i, cell in enumerate(cells):
+            for k in range(9):
+                if candidates[cell] & BITS[k]:
+                    places[k] |= 1 << i
+
+        numbers = [k for k in range(9) if 2 <= POPCOUNT[places[k]] <= size]
+
+        for subset in combinations(numbers, size):
+            union, bits = 0, 0
+
+            for k in subset:
+                union |= places[k]
+                bits |= BITS[k]
+
+            if POPCOUNT[union] == size:
+                inside = [cell for i, cell in enumerate(cells) if union & 1 << i]
+                eliminate(sudoku_game, name, inside, ALL & ~bits, steps)
+
+    return bool(steps), steps
+
+
+@register(1)
+def hidden_pair(sudoku_game):
+    return __hidden(sudoku_game, 2, 'hidden_pair')
+
+
+@register(2)
+def hidden_triple(sudoku_game):
+    return __hidden(sudoku_game, 3, 'hidden_triple')
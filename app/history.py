@@ -0,0 +1,125 @@
+# file:     history.py
+# author:   Adam Felix
+# help:     new coder tutorials
+
+# Move history:     every move keeps the number it replaced, so undoing
+#                   it is a single step back, whatever came before.
+#                   Moves form a tree: a move made after an undo starts
+#                   a new branch instead of throwing the undone moves
+#                   away, and redo follows the branch last taken.
+
+
+class Move(object):
+    """
+    number put in (row, col) over previous; 0 for either is a blank.
+    reason names what made the move, e.g. a solver strategy.
+    """
+
+    __slots__ = ('row', 'col', 'number', 'previous', 'reason',
+                 'parent', 'children', 'next', 'depth')
+
+    def __init__(self, row, col, number, previous, parent=None, reason=None):
+        self.row = row
+        self.col = col
+        self.number = number
+        self.previous = previous
+        self.reason = reason
+        self.parent = parent
+        self.children = []
+        self.next = None
+        self.depth = parent.depth + 1 if parent is not None else 0
+
+
+    def __str__(self):
+        if self.number:
+            string = 'Entered %d in row %d column %d' % (self.number, self.row + 1, self.col + 1)
+
+        else:
+            string = 'Deleted %d in row %d column %d' % (self.previous, self.row + 1, self.col + 1)
+
+        if self.reason is not None:
+            string += ' (%s)' % self.reason
+
+        return string
+
+
+class MoveHistory(object):
+    """
+    The tree of moves, and the move the game is at.  len() is the
+    number of moves that can be undone.
+    """
+
+    def __init__(self):
+        self.root = Move(-1, -1, 0, 0)
+        self.current = self.root
+
+
+    def __len__(self):
+        return self.current.depth
+
+
+    def record(self, row, col, number, previous, reason=None):
+        """
+        Adds a move after the current one and makes it current.
+        Returns it, or None if it changes nothing.
+        """
+
+        if number == previous:
+            return None
+
+        move = Move(row, col, number, previous, self.current, reason)
+        self.current.children.append(move)
+        self.current.next = move
+        self.current = move
+
+        return move
+
+
+    def undo(self):
+        """
+        Steps back over the current move and returns it, for the game
+        to put its previous number back; None at the start.
+        """
+
+        move = self.current
+
+        if move.parent is None:
+            return None
+
+        self.current = move.parent
+        self.current.next = move
+
+        return move
+
+
+    def redo(self, branch=None):
+        """
+        Steps forward to a move after the current one, the one last
+        undone unless a branch (an index into branches()) is given,
+        and returns it; None if there is none.
+        """
+
+        move = self.current.next if branch is None else self.current.children[branch]
+
+        if move is not None:
+            self.current = move
+
+        return move
+
+
+    def branches(self):
+        return list(self.current.children)
+
+
+    def moves(self):
+        """
+        The moves from the start to the current one, newest first.
+        """
+
+        move, moves = self.current, []
+
+        while move.parent is not None:
+            moves.append(move)
+            move = move.parent
+
+        return moves
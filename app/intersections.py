@@ -0,0 +1,56 @@
+# file:     intersections.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# Pointing strategy:    If a number fits in a box only along one row
+#                       (or column), it can be removed from the rest
+#                       of that row (or column).
+#
+# Box-line strategy:    If a number fits in a row (or column) only
+#                       inside one box, it can be removed from the
+#                       rest of that box.
+
+
+from candidates import BITS
+from strategies import eliminate, empty_cells, register
+from units import BOXES, CELL_UNITS, COLS, ROWS
+
+
+def __intersect(sudoku_game, units, kinds, name):
+    """
+    For every unit and number, if all the cells where the number fits
+    share one of the lines given by kinds (0 row, 1 column, 2 box),
+    rule the number out of the rest of that line.
+    """
+
+    candidates = sudoku_game.game.candidates
+    steps = []
+
+    for unit in units:
+        cells = empty_cells(sudoku_game, unit)
+
+        for bit in BITS:
+            places = [cell for cell in cells if candidates[cell] & bit]
+
+            if len(places) < 2:
+                continue
+
+            for kind in kinds:
+                line = CELL_UNITS[places[0]][kind]
+
+                if all(cell in line for cell in places):
+                    others = [cell for cell in empty_cells(sudoku_game, line)
+                              if cell not in unit]
+                    eliminate(sudoku_game, name, others, bit, steps)
+
+    return bool(steps), steps
+
+
+@register(1)
+def pointing(sudoku_game):
+    return __intersect(sudoku_game, BOXES, (0, 1), 'pointing')
+
+
+@register(1)
+def box_line(sudoku_game):
+    return __intersect(sudoku_game, ROWS + COLS, (2,), 'box_line')
@@ -0,0 +1,49 @@
+# file:     naked.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# Naked strategy:   If n cells of a unit have, between them, only n
+#                   candidates, then those n numbers must go in those
+#                   cells and can be removed from the rest of the unit.
+
+
+from itertools import combinations
+
+from candidates import POPCOUNT
+from strategies import eliminate, empty_cells, register
+from units import UNITS
+
+
+def __naked(sudoku_game, size, name):
+    candidates = sudoku_game.game.candidates
+    steps = []
+
+    for unit in UNITS:
+        cells = empty_cells(sudoku_game, unit)
+
+        if len(cells) <= size:
+            continue
+
+        small = [cell for cell in cells if 2 <= POPCOUNT[candidates[cell]] <= size]
+
+        for subset in combinations(small, size):
+            union = 0
+
+            for cell in subset:
+                union |= candidates[cell]
+
+            if POPCOUNT[union] == size:
+                others = [cell for cell in cells if cell not in subset]
+                eliminate(sudoku_game, name, others, union, steps)
+
+    return bool(steps), steps
+
+
+@register(1)
+def naked_pair(sudoku_game):
+    return __naked(sudoku_game, 2, 'naked_pair')
+
+
+@register(2)
+def naked_triple(sudoku_game):
+    return __naked(sudoku_game, 3, 'naked_triple')
@@ -0,0 +1,112 @@
+# file:     pool.py
+# author:   Adam Felix
+# help:     multiprocessing (Python docs)
+
+# Solve pool:   the puzzles, in any format parse_lines reads, are cut
+#               into chunks of 81-byte grids and farmed out to worker
+#               processes.  The solutions come back the same way and
+#               are handed out in input order.
+
+import argparse
+import collections
+import multiprocessing
+import sys
+
+from solver import BACKENDS, solve_many
+from sudokugame import TO_TEXT, parse_lines
+
+
+def __chunks(puzzles, chunksize):
+    chunk = []
+
+    for board in parse_lines(puzzles):
+        chunk.append(board.grid)
+
+        if len(chunk) == chunksize:
+            yield b''.join(chunk)
+            chunk = []
+
+    if chunk:
+        yield b''.join(chunk)
+
+
+def __solve_chunk(chunk, backend):
+    chunk = chunk.translate(TO_TEXT)
+    puzzles = (chunk[i:i + 81] for i in range(0, len(chunk), 81))
+
+    return ''.join(solve_many(puzzles, backend=backend)).encode('ascii')
+
+
+def solve_parallel(puzzles, processes=None, chunksize=256,
+                   backend='strategies', max_pending=None):
+    """
+    Yields the solution of each puzzle in the lines of puzzles, in
+    input order, like solver.solve_many but spread over a pool of
+    processes.  At most max_pending chunks (by default four per
+    process) are in flight or waiting to be reordered at any time.
+    """
+
+    processes = processes or multiprocessing.cpu_count()
+    max_pending = max_pending or 4 * processes
+
+    with multiprocessing.Pool(processes) as pool:
+        pending = collections.deque()
+
+        for chunk in __chunks(puzzles, chunksize):
+            pending.append(pool.apply_async(__solve_chunk, (chunk, backend)))
+
+            if len(pending) >= max_pending:
+                yield from __split(pending.popleft().get())
+
+        while pending:
+            yield from __split(pending.popleft().get())
+
+
+def __split(solutions):
+    for i in range(0, len(solutions), 81):
+        yield solutions[i:i + 81].decode('ascii')
+
+
+def parse_arguments():
+    """
+    Parses arguments of the form:
+        pool.py [puzzle file] [--jobs <n>] [--chunksize <n>]
+                [--backend <backend>]
+    """
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('puzzles',
+                            help='File of puzzles (default: stdin)',
+                            nargs='?',
+                            type=argparse.FileType('rb'),
+                            default=sys.stdin.buffer)
+    arg_parser.add_argument('--jobs',
+                            help='Number of worker processes (default: all cores)',
+                            type=int,
+                            default=None)
+    arg_parser.add_argument('--chunksize',
+                            help='Puzzles sent to a worker at a time',
+                            type=int,
+                            default=256)
+    arg_parser.add_argument('--backend',
+                            help='Solving backend',
+                            type=str,
+                            choices=BACKENDS,
+                            default='strategies')
+
+    return vars(arg_parser.parse_args())
+
+
+def main():
+    args = parse_arguments()
+
+    with args['puzzles'] as puzzles:
+        for solution in solve_parallel(puzzles,
+                                       processes=args['jobs'],
+                                       chunksize=args['chunksize'],
+                                       backend=args['backend']):
+            sys.stdout.write(solution + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,140 +5,291 @@
 #           Programming Sudoku (Wei-Meng Lee)
 
 
+import argparse
+import functools
+import sys
+import time
+
+import dlx
+import strategies
+
+# The strategy modules register themselves with strategies on import.
+import hidden
+import intersections
+import naked
 import unique
+import xwing
+
+from candidates import ALL, BITS, NUMBER, NUMBERS, POPCOUNT
+from canonical import SolutionCache
+from corpus import PuzzleCorpus
+from sudokugame import TO_TEXT, SudokuError, SudokuGame, parse_lines
+from stats import SolverStats
+from units import COL, PEERS, ROW, UNITS
+
+
+BACKENDS = ('strategies', 'dlx')
 
-from sudokugame import SudokuError, SudokuGame
 
 class SudokuSolver(object):
 
-    def __init__(self, boardfile):
+    def __init__(self, boardfile=None, backend='strategies', cache=None, stats=False,
+                 trace=None):
+        """
+        cache, a canonical.SolutionCache, is looked up before solving
+        and given every puzzle solved.  With stats, every solve()
+        fills in a new SolverStats, timing each strategy call.
+
+        trace, if given, is called with every step of a solve as a
+        (name, row, col, number) tuple, as the strategies return them:
+        a positive number was placed, a negative one ruled out.  The
+        cells filled in by the search, dlx or the cache come last,
+        named 'backtrack', 'dlx' or 'cache'.
+        """
+
+        if backend not in BACKENDS:
+            raise SudokuError('Backend must be one of %s.' % ', '.join(BACKENDS))
+
+        self.backend = backend
+        self.cache = cache
+        self.trace = trace
         self.game = SudokuGame(boardfile)
-        self.__strategies = [[self.__cleanup, self.__unique], [], [], []]
-        self.__strats_used = []
-        self.solve()
+        self.__strategies = [[self.__cleanup]] + [[] for _ in range(strategies.LEVELS - 1)]
 
+        for level in range(strategies.LEVELS):
+            self.__strategies[level] += [functools.partial(strategy, self)
+                                         for strategy in strategies.registered(level)]
 
-    def __unique(self):
-        return unique.unique(self)
+        self.stats = None
 
+        if stats:
+            self.stats = SolverStats()
+            self.__strategies = [[self.__timed(strategy, level) for strategy in level_strategies]
+                                 for level, level_strategies in enumerate(self.__strategies)]
 
-    def __str__(self):
-        ans = ''
-        for i in range(9):
-            for j in range(9):
-                ans += str(self.game.puzzle[i][j])
-            ans += '\n'
+        self.__reset_stats()
+        self.__recount()
 
-        return ans
+        if boardfile is not None:
+            self.solve()
 
 
-    def __count_solved(self):
+    def load(self, board, solve=True):
+        """
+        Starts a new SudokuBoard, reusing this solver and its game,
+        and solves it unless solve is False.
+        """
+
+        self.game.load(board)
+        self.__reset_stats()
+        self.__recount()
+
+        if solve:
+            self.solve()
+
+
+    def count_solutions(self, limit=2, excluding=None):
+        """
+        Counts the solutions of the start puzzle, giving up as soon as
+        limit of them have been found.  excluding, a (row, col, value)
+        triple, rules value out of that cell first.  The game is left
+        at its start puzzle.
+        """
+
+        self.game.start()
+        self.__recount()
+
+        return self.count_completions(limit, excluding)
+
+
+    def count_completions(self, limit=2, excluding=None):
+        """
+        count_solutions of the board as it stands instead of the start
+        puzzle.  The search runs from a trail mark and is rolled back
+        to it, so the board is left as it was and can be asked again
+        without being rebuilt.
+        """
+
+        mark = self.__mark()
         count = 0
 
-        for i in range(9):
-            for j in range(9):
-                if self.game.puzzle[i][j] != 0:
-                    count += 1
+        if excluding is not None:
+            row, col, value = excluding
+            self.__eliminate(9 * row + col, BITS[value - 1])
+
+        if self.__is_valid() and self.__propagate(self.__singles()):
+            count = self.__count(limit)
+
+        self.__undo(mark)
 
         return count
 
 
-    def cleanup(self):
-        return self.__cleanup()
+    def solution(self):
+        """
+        The puzzle as one 81-char line, '0' for cells left unsolved.
+        """
 
+        return self.game.puzzle.translate(TO_TEXT).decode('ascii')
 
-    def cleanup_at(self, row, col):
-        return self.__cleanup_at(row, col)
 
+    def __str__(self):
+        line = self.solution()
 
-    def __cleanup(self):
-        truth_value = False
+        return ''.join(line[i:i + 9] + '\n' for i in range(0, 81, 9))
 
-        for i in range(9):
-            for j in range(9):
 
-                if (self.game.puzzle[i][j] == 0
-                        and sum(self.game.entries[i][j]) == 1):
+    def __recount(self):
+        """
+        Rebuilds the running totals from the whole board.  Every
+        placement and elimination afterwards keeps them current.
+        """
 
-                    for k in range(9):
+        candidates = self.game.candidates
 
-                        if self.game.entries[i][j][k] == 1:
-                            self.game.puzzle[i][j] = k + 1
+        self.__trail = []
+        self.__placed = []
+        self.__n_solved = 81 - self.game.puzzle.count(0)
+        self.__n_candidates = sum(POPCOUNT[mask] for mask in candidates)
+        self.__n_empty = candidates.tolist().count(0)
 
-                    problem = self.__cleanup_at(i, j)
 
-                    if problem:
-                        self.__reset_value_at(i, j)
+    def __count_solved(self):
+        return self.__n_solved
 
-                    else:
-                        truth_value |= True
 
-        return truth_value, '__cleanup', -1 , -1, -1
+    def __eliminate(self, cell, bits):
+        """
+        Clears bits from the candidates of cell, remembering the old
+        mask on the trail so that __undo can put it back.
+        """
 
+        candidates = self.game.candidates
+        mask = candidates[cell]
 
-    def __cleanup_at(self, row, col):
-        value = self.game.puzzle[row][col]
+        if mask & bits:
+            self.__trail.append((cell, mask))
+            candidates[cell] = mask & ~bits
+            self.__n_candidates -= POPCOUNT[mask & bits]
 
-        for _row in range(9):
-            if _row != row:
-                self.game.entries[_row][col][value - 1] = 0
+            if not mask & ~bits:
+                self.__n_empty += 1
 
-        for _col in range(9):
-            if _col != col:
-                self.game.entries[row][_col][value - 1] = 0
 
-        _row_, _col_ = row // 3, col // 3
+    def __set_value_at(self, cell, value):
+        old_value = self.game.puzzle[cell]
+        self.game.puzzle[cell] = value
+        self.__n_solved += (value != 0) - (old_value != 0)
 
-        for i in range(3):
-            for j in range(3):
-                if 3 * _row_ + i != row and 3 * _col_ + j != col:
-                    self.game.entries[3 * _row_ + i][3 * _col_ + j][value - 1] = 0
+        if value != 0:
+            self.__placed.append(cell)
 
-        return not self.__is_valid()
 
+    def __mark(self):
+        return (len(self.__trail), len(self.__placed),
+                self.__n_solved, self.__n_candidates, self.__n_empty)
 
-    def __is_valid(self, char=-1, row=-1, col=-1):
 
-        if char == row == col == -1:
+    def __undo(self, mark):
+        """
+        Rolls the board back to the given mark, popping the trail
+        instead of recomputing the candidates.
+        """
 
-            for i in range(9):
-                for j in range(9):
-                    if sum(self.game.entries[i][j]) == 0:
-                        return False
+        n_trail, n_placed, n_solved, n_candidates, n_empty = mark
+        candidates, puzzle = self.game.candidates, self.game.puzzle
+        trail, placed = self.__trail, self.__placed
 
-            return True
+        while len(trail) > n_trail:
+            cell, mask = trail.pop()
+            candidates[cell] = mask
 
-        else:
-            if self.__is_valid_row(char=char, row=row):
-                if self.__is_valid_col(char=char, col=col):
-                    if self.__is_valid_box(char=char, row=row, col=col):
-                        return True
+        while len(placed) > n_placed:
+            puzzle[placed.pop()] = 0
 
-            return False
+        self.__n_solved = n_solved
+        self.__n_candidates = n_candidates
+        self.__n_empty = n_empty
 
 
-    def __is_valid_row(self, char, row):
-        return all(self.game.puzzle[row][i] != char for i in range(9))
+    def cleanup(self):
+        return self.__cleanup()
 
 
-    def __is_valid_col(self, char, col):
-        return all(self.game.puzzle[i][col] != char for i in range(9))
+    def cleanup_at(self, row, col):
+        return self.__cleanup_at(9 * row + col)
 
 
-    def __is_valid_box(self, char, row, col):
-        x, y = row // 3 * 3, col // 3 * 3
+    def eliminate(self, row, col, value):
+        """
+        Rules value out of the candidates of (row, col).
+        """
 
-        for i in range(3):
-            for j in range(3):
-                if self.game.puzzle[x + i][y + j] == char:
-                    return False
+        self.__eliminate(9 * row + col, BITS[value - 1])
+
+
+    def difficulty(self):
+        """
+        The highest strategy level the last solve() needed, or
+        strategies.LEVELS if it had to fall back to backtracking.
+        """
+
+        if self.__backtracked:
+            return strategies.LEVELS
+
+        return self.__level
+
+
+    def place(self, row, col, value):
+        """
+        Enters value at (row, col), keeps it as the only candidate
+        of the cell and clears it from the peers.  Returns True if
+        that left some cell without candidates.
+        """
+
+        self.__eliminate(9 * row + col, ~BITS[value - 1])
+        self.__set_value_at(9 * row + col, value)
+
+        return self.__cleanup_at(9 * row + col)
+
+
+    def __cleanup(self):
+        truth_value, steps = False, []
+        candidates = self.game.candidates
+
+        for cell in range(81):
 
-        return True
+            if (self.game.puzzle[cell] == 0
+                    and POPCOUNT[candidates[cell]] == 1):
 
+                mark = self.__mark()
 
-    def __reset_value_at(self, i, j):
-        self.game.puzzle[i][j] = 0
-        self.game.find_permissible_entries(start_puzzle=False)
+                self.__set_value_at(cell, NUMBER[candidates[cell]])
+
+                problem = self.__cleanup_at(cell)
+
+                if problem:
+                    self.__undo(mark)
+
+                else:
+                    truth_value |= True
+                    steps.append(('cleanup', ROW[cell], COL[cell],
+                                  self.game.puzzle[cell]))
+
+        return truth_value, steps
+
+
+    def __cleanup_at(self, cell):
+        bit = BITS[self.game.puzzle[cell] - 1]
+
+        for peer in PEERS[cell]:
+            self.__eliminate(peer, bit)
+
+        return not self.__is_valid()
+
+
+    def __is_valid(self):
+        return self.__n_empty == 0
 
 
     def __keep_going(self):
@@ -146,35 +297,150 @@ class SudokuSolver(object):
 
 
     def __count_candidates(self):
-        count = 0
+        return self.__n_candidates
 
-        for i in range(9):
-            for j in range(9):
-                count += sum(self.game.entries[i][j])
 
-        return count
+    def solve(self):
+        """
+        Solves the puzzle, through the cache if there is one, and
+        returns the SolverStats of the solve (None without stats).
+        """
 
+        start = time.perf_counter()
+        cached = False
 
-    def solve(self):
-        n_candidates = self.__count_candidates()
-        n_old_candidates = n_candidates + 1
+        if self.cache is None:
+            self.__solve()
+
+        else:
+            puzzle = bytes(self.game.puzzle)
+            solution = self.cache.get(puzzle)
+            cached = solution is not None
+
+            if cached:
+                self.__fill(solution, 'cache')
+
+            else:
+                self.__solve()
+
+                if self.__count_solved() == 81 and self.__is_valid():
+                    self.cache.put(puzzle, self.game.puzzle)
+
+        if self.stats is not None:
+            stats = self.stats
+            stats.solves = 1
+            stats.cached = int(cached)
+            stats.seconds = time.perf_counter() - start
+            stats.level = self.__level
+            stats.backtracked = int(self.__backtracked)
+            stats.nodes = self.nodes
+            stats.guesses = self.__guesses
+            stats.dead_ends = self.__dead_ends
+            stats.max_depth = self.__max_depth
 
-        while self.__keep_going() and n_candidates < n_old_candidates:
-            n_old_candidates = n_candidates
+        return self.stats
 
-            if self.__keep_going() and not self.__execute_strategies(0):
-                if self.__keep_going() and not self.__execute_strategies(1):
-                    if self.__keep_going() and not self.__execute_strategies(2):
-                        self.__execute_strategies(3)
 
+    def __reset_stats(self):
+        self.__level = 0
+        self.__backtracked = False
+        self.nodes = 0
+        self.__guesses = 0
+        self.__dead_ends = 0
+        self.__max_depth = 0
+
+        if self.stats is not None:
+            self.stats = SolverStats()
+
+
+    def __timed(self, strategy, level):
+        """
+        strategy, reporting its calls to stats.
+        """
+
+        name = getattr(strategy, 'func', strategy).__name__.strip('_')
+
+        def timed():
+            record = self.stats.strategy(name, level)
             n_candidates = self.__count_candidates()
 
+            start = time.perf_counter()
+            changed, steps = strategy()
+            record.seconds += time.perf_counter() - start
+
+            # a placement keeps the number as the only candidate of its
+            # cell, so every candidate gone was ruled out, by the
+            # strategy or by the cleanup of the peers after a placement
+            eliminated = n_candidates - self.__count_candidates()
+
+            record.calls += 1
+            record.hits += bool(changed or eliminated)
+            record.placed += sum(1 for step in steps if step[3] > 0)
+            record.eliminated += eliminated
+
+            return changed, steps
+
+        return timed
+
+
+    def __solve(self):
+        if self.backend == 'dlx':
+            self.__solve_dlx()
+            return
+
+        # back to level 0 after any progress, until no level makes any
+        while self.__keep_going():
+            for level in range(strategies.LEVELS):
+                if self.__execute_strategies(level):
+                    break
+
+            else:
+                break
+
         if self.__keep_going():
-            self.__backtrack()
+            self.__backtracked = True
+            puzzle = bytes(self.game.puzzle)
+
+            if self.__backtrack():
+                self.__trace_filled(puzzle, 'backtrack')
+
+
+    def __solve_dlx(self):
+        links = dlx.dancing_links()
+        solution = links.solve(self.game.puzzle)
+        self.nodes = links.n_nodes
+
+        if solution is not None:
+            self.__fill(solution, 'dlx')
+
+
+    def __fill(self, solution, name):
+        puzzle = bytes(self.game.puzzle)
+
+        for cell, value in enumerate(solution):
+            self.game.puzzle[cell] = value
+            self.game.candidates[cell] = BITS[value - 1]
+
+        self.__recount()
+        self.__trace_filled(puzzle, name)
+
+
+    def __trace_filled(self, puzzle, name):
+        """
+        Traces a placement for every cell blank in puzzle and filled
+        in now.
+        """
+
+        if self.trace is None:
+            return
+
+        for cell, value in enumerate(self.game.puzzle):
+            if value and not puzzle[cell]:
+                self.trace((name, ROW[cell], COL[cell], value))
 
 
     def __execute_strategies(self, level):
-        if level > 3:
+        if level >= strategies.LEVELS:
             raise SudokuError
 
         n_initial_candidates = self.__count_candidates()
@@ -182,9 +448,14 @@ class SudokuSolver(object):
         i = 0
 
         while i < len(self.__strategies[level]) and self.__keep_going():
-            is_true, name, row, col, val = self.__strategies[level][i]()
+            is_true, steps = self.__strategies[level][i]()
+
+            if self.trace is not None:
+                for step in steps:
+                    self.trace(step)
+
             if is_true or self.__count_candidates() < n_initial_candidates:
-                self.__strats_used.append(10 * level + i)
+                self.__level = max(self.__level, level)
                 return True
 
             i+= 1
@@ -193,44 +464,297 @@ class SudokuSolver(object):
 
 
     def __backtrack(self):
-        _unassigned, row, col = self.__unassigned()
+        """
+        Depth first search that always branches on the cell with the
+        fewest candidates.  After every guess the naked and hidden
+        singles are propagated, and a dead end is rolled back from
+        the trail.
+        """
+
+        return self.__propagate(self.__singles()) and self.__search()
 
-        if not _unassigned:
+
+    def backtrack(self):
+        self.__backtrack()
+
+
+    def __singles(self):
+        queue = []
+
+        for cell, mask in enumerate(self.game.candidates):
+            if (POPCOUNT[mask] == 1
+                    and self.game.puzzle[cell] == 0):
+                queue.append((cell, NUMBER[mask]))
+
+        return queue
+
+
+    def __search(self, depth=1):
+        choices = self.__branch()
+
+        if choices is None:
             return True
 
-        for x in range(9):
+        self.__guesses += 1
+
+        if depth > self.__max_depth:
+            self.__max_depth = depth
+
+        mark = self.__mark()
 
-            if self.__is_valid(char=x+1, row=row, col=col):
-                self.game.puzzle[row][col] = x + 1
+        for cell, value in choices:
+            self.nodes += 1
 
-                if self.__backtrack():
-                    return True
+            if self.__propagate([(cell, value)]) and self.__search(depth + 1):
+                return True
 
-                self.game.puzzle[row][col] = 0
+            self.__undo(mark)
+            self.__dead_ends += 1
 
         return False
 
 
-    def backtrack(self):
-        self.__backtrack()
+    def __count(self, limit):
+        choices = self.__branch()
+
+        if choices is None:
+            return 1
+
+        mark = self.__mark()
+        count = 0
+
+        for cell, value in choices:
+
+            if self.__propagate([(cell, value)]):
+                count += self.__count(limit - count)
+
+            self.__undo(mark)
+
+            if count >= limit:
+                break
+
+        return count
+
+
+    def __branch(self):
+        """
+        The (cell, value) choices to branch on, exactly one of which
+        holds in any solution: the values left for the cell with the
+        fewest candidates or, when fewer, the places left for a number
+        in a row, column or box, as dlx branches on its smallest
+        column.  None once the board is full.
+        """
+
+        if self.__n_solved == 81:
+            return None
+
+        candidates = self.game.candidates
+        best_cell, best_count = -1, 10
+
+        for cell, mask in enumerate(candidates):
+            count = POPCOUNT[mask]
+
+            if 1 < count < best_count:
+                best_cell, best_count = cell, count
+
+                if count == 2:
+                    break
+
+        if best_cell == -1:
+            return None
+
+        if best_count > 2:
+            places = self.__fewest_places(best_count)
 
+            if places is not None:
+                return places
 
-    def __unassigned(self):
-        for i in range(9):
-            for j in range(9):
-                if self.game.puzzle[i][j] == 0:
-                    return True, i, j
+        return [(best_cell, value) for value in NUMBERS[candidates[best_cell]]]
 
-        return False, -1, -1
 
+    def __fewest_places(self, limit):
+        """
+        The (cell, number) places of the number with the fewest places
+        (two or three) left in some unit, if fewer than limit; None if
+        there is no such number.
+        """
+
+        candidates = self.game.candidates
+        best = None
+
+        for unit in UNITS:
+            once = twice = thrice = more = 0
+
+            for cell in unit:
+                mask = candidates[cell]
+                more |= thrice & mask
+                thrice |= twice & mask
+                twice |= once & mask
+                once |= mask
+
+            for count, numbers in ((2, twice & ~thrice), (3, thrice & ~more)):
+                if numbers and count < limit:
+                    number = NUMBERS[numbers][0]
+                    bit = BITS[number - 1]
+                    best = [(cell, number) for cell in unit if candidates[cell] & bit]
+                    limit = count
+                    break
+
+            if limit == 2:
+                break
+
+        return best
+
+
+    def __propagate(self, queue):
+        """
+        Places every (cell, value) in queue together with all the
+        naked and hidden singles that follow from it.  Returns False
+        as soon as the board runs into a contradiction.
+        """
+
+        candidates, puzzle = self.game.candidates, self.game.puzzle
+
+        while True:
+
+            while queue:
+                cell, value = queue.pop()
+
+                if puzzle[cell] != 0:
+                    if puzzle[cell] != value:
+                        return False
+                    continue
+
+                bit = BITS[value - 1]
+
+                if not candidates[cell] & bit:
+                    return False
+
+                self.__eliminate(cell, ~bit)
+                self.__set_value_at(cell, value)
+
+                for peer in PEERS[cell]:
+                    mask = candidates[peer]
+
+                    if mask & bit:
+                        self.__eliminate(peer, bit)
+                        mask ^= bit
+
+                        if not mask:
+                            return False
+
+                        if POPCOUNT[mask] == 1:
+                            queue.append((peer, NUMBER[mask]))
+
+            for unit in UNITS:
+                once = twice = 0
+
+                for cell in unit:
+                    mask = candidates[cell]
+                    twice |= once & mask
+                    once |= mask
+
+                if once != ALL:
+                    return False
+
+                singles = once & ~twice
+
+                for cell in unit:
+                    mask = candidates[cell]
+
+                    if mask & singles and mask != mask & singles:
+                        if POPCOUNT[mask & singles] > 1:
+                            return False
+
+                        queue.append((cell, NUMBER[mask & singles]))
+
+            if not queue:
+                return True
+
+
+
+def solve_many(puzzles, backend='strategies', cache=None, stats=None):
+    """
+    Yields the solution() of each puzzle in the lines of puzzles, in
+    any format parse_lines reads, one at a time, with a single solver
+    (and cache, if given) for the whole stream.  The SolverStats of
+    every solve are added to stats, if given.
+    """
+
+    solver = SudokuSolver(backend=backend, cache=cache, stats=stats is not None)
+
+    for board in parse_lines(puzzles):
+        solver.load(board)
+
+        if stats is not None:
+            stats.add(solver.stats)
+
+        yield solver.solution()
+
+
+def parse_arguments():
+    """
+    Parses arguments of the form:
+        solver.py [puzzle file] [--number <n>] [--backend <backend>]
+                  [--cache] [--cache-file <path>] [--stats]
+    where the puzzle file holds one-line (SDM) or nine-line (SDK)
+    puzzles and defaults to stdin; with --number only the n-th puzzle
+    of the file (counting from 0) is solved
+    """
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('puzzles',
+                            help='File of puzzles (default: stdin)',
+                            nargs='?',
+                            type=argparse.FileType('rb'),
+                            default=sys.stdin.buffer)
+    arg_parser.add_argument('--number',
+                            help='Solve only this puzzle of the file',
+                            type=int,
+                            default=None)
+    arg_parser.add_argument('--backend',
+                            help='Solving backend',
+                            type=str,
+                            choices=BACKENDS,
+                            default='strategies')
+    arg_parser.add_argument('--cache',
+                            help='Reuse the solutions of repeated and equivalent puzzles',
+                            action='store_true')
+    arg_parser.add_argument('--cache-file',
+                            help='dbm file keeping the cached solutions between runs',
+                            type=str,
+                            default=None)
+    arg_parser.add_argument('--stats',
+                            help='Print solver statistics to stderr at the end',
+                            action='store_true')
+
+    return vars(arg_parser.parse_args())
 
 
 def main():
-    solver = SudokuSolver(open('n00b.sudoku', 'r'))
-    print(solver)
-    print('\n'.join('=' * 40 for _ in range(3)))
-    solver = SudokuSolver(open('l33t.sudoku', 'r'))
-    print(solver)
+    args = parse_arguments()
+
+    with args['puzzles'] as puzzles:
+        if args['number'] is not None:
+            with PuzzleCorpus(puzzles) as corpus:
+                puzzles = [corpus[args['number']].to_string()]
+
+        cache = None
+
+        if args['cache'] or args['cache_file'] is not None:
+            cache = SolutionCache(path=args['cache_file'])
+
+        stats = SolverStats() if args['stats'] else None
+
+        for solution in solve_many(puzzles, backend=args['backend'],
+                                   cache=cache, stats=stats):
+            sys.stdout.write(solution + '\n')
+
+        if stats is not None:
+            sys.stderr.write(str(stats) + '\n')
+
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == '__main__':
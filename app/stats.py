@@ -0,0 +1,124 @@
+# file:     stats.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# Solver statistics:    what a solve() went through, strategy by
+#                       strategy and in the search.  The solver only
+#                       times its strategies when it was made with
+#                       stats=True; the search counters are plain
+#                       integers it keeps anyway.
+
+
+class StrategyStats(object):
+    """
+    Calls of one strategy, how many made progress (hits), the time
+    spent in it, and the numbers it placed and ruled out.
+    """
+
+    __slots__ = ('level', 'calls', 'hits', 'seconds', 'placed', 'eliminated')
+
+    def __init__(self, level):
+        self.level = level
+        self.calls = 0
+        self.hits = 0
+        self.seconds = 0.0
+        self.placed = 0
+        self.eliminated = 0
+
+
+    def add(self, other):
+        self.calls += other.calls
+        self.hits += other.hits
+        self.seconds += other.seconds
+        self.placed += other.placed
+        self.eliminated += other.eliminated
+
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SolverStats(object):
+    """
+    Statistics of a solve(): the StrategyStats of every strategy by
+    name, the highest level that made progress, and for the search
+    the values tried (nodes), the cells branched on (guesses), the
+    values taken back (dead_ends) and the deepest guess (max_depth).
+    A SolverStats can also add up those of many solves.
+    """
+
+    def __init__(self):
+        self.strategies = {}
+        self.solves = 0
+        self.cached = 0
+        self.seconds = 0.0
+        self.level = 0
+        self.backtracked = 0
+        self.nodes = 0
+        self.guesses = 0
+        self.dead_ends = 0
+        self.max_depth = 0
+
+
+    def strategy(self, name, level):
+        """
+        The StrategyStats of name, made on first use.
+        """
+
+        record = self.strategies.get(name)
+
+        if record is None:
+            record = self.strategies[name] = StrategyStats(level)
+
+        return record
+
+
+    def add(self, other):
+        """
+        Adds the statistics of other to these.
+        """
+
+        for name, record in other.strategies.items():
+            self.strategy(name, record.level).add(record)
+
+        self.solves += other.solves
+        self.cached += other.cached
+        self.seconds += other.seconds
+        self.level = max(self.level, other.level)
+        self.backtracked += other.backtracked
+        self.nodes += other.nodes
+        self.guesses += other.guesses
+        self.dead_ends += other.dead_ends
+        self.max_depth = max(self.max_depth, other.max_depth)
+
+
+    def as_dict(self):
+        return {
+            'solves': self.solves,
+            'cached': self.cached,
+            'seconds': self.seconds,
+            'level': self.level,
+            'backtracked': self.backtracked,
+            'nodes': self.nodes,
+            'guesses': self.guesses,
+            'dead_ends': self.dead_ends,
+            'max_depth': self.max_depth,
+            'strategies': {name: record.as_dict()
+                           for name, record in self.strategies.items()},
+        }
+
+
+    def __str__(self):
+        lines = ['%-16s %5s %8s %8s %10s %8s %10s' % (
+                'strategy', 'level', 'calls', 'hits', 'seconds', 'placed', 'eliminated')]
+
+        for name, r in sorted(self.strategies.items(), key=lambda item: item[1].level):
+            lines.append('%-16s %5d %8d %8d %10.4f %8d %10d' % (
+                    name, r.level, r.calls, r.hits, r.seconds, r.placed, r.eliminated))
+
+        lines.append('solves %d (cached %d, backtracked %d) in %.4fs' % (
+                self.solves, self.cached, self.backtracked, self.seconds))
+        lines.append('search: %d nodes, %d guesses, %d dead ends, max depth %d' % (
+                self.nodes, self.guesses, self.dead_ends, self.max_depth))
+
+        return '\n'.join(lines)
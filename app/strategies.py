@@ -0,0 +1,60 @@
+# file:     strategies.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# Strategy registry:    strategy modules register their strategies
+#                       under a level, 0 (simplest) to 3.  The solver
+#                       tries the levels in order and goes back to
+#                       level 0 after any progress.
+#
+# A strategy takes the SudokuSolver and returns (changed, steps),
+# steps being (name, row, col, number) tuples: a positive number was
+# placed, a negative one was ruled out of the cell.
+
+
+from candidates import NUMBERS
+from sudokugame import SudokuError
+from units import COL, ROW
+
+
+LEVELS = 4
+
+_registry = [[] for _ in range(LEVELS)]
+
+
+def register(level):
+    """
+    Decorator adding a strategy to the given level.
+    """
+
+    if not 0 <= level < LEVELS:
+        raise SudokuError('Strategy levels go from 0 to %d.' % (LEVELS - 1))
+
+    def decorator(strategy):
+        _registry[level].append(strategy)
+        return strategy
+
+    return decorator
+
+
+def registered(level):
+    return tuple(_registry[level])
+
+
+def empty_cells(sudoku_game, unit):
+    puzzle = sudoku_game.game.puzzle
+    return [cell for cell in unit if puzzle[cell] == 0]
+
+
+def eliminate(sudoku_game, name, cells, bits, steps):
+    """
+    Rules bits out of every cell in cells, recording a step for each
+    number actually taken away.
+    """
+
+    candidates = sudoku_game.game.candidates
+
+    for cell in cells:
+        for number in NUMBERS[candidates[cell] & bits]:
+            sudoku_game.eliminate(ROW[cell], COL[cell], number)
+            steps.append((name, ROW[cell], COL[cell], -number))
@@ -3,7 +3,31 @@
 # help:     new coder tutorials
 
 
+from candidates import ALL, BITS, new_candidates
 from constants import *
+from units import COL, PEERS, ROW, UNITS
+
+
+MARKS = (2, 3, 4)
+
+# bytes.translate table from grid bytes (0-9) to the chars '0'-'9'
+TO_TEXT = bytes.maketrans(bytes(range(10)), b'0123456789')
+
+# bytes.translate table from puzzle text to grid bytes: '1'-'9' to 1-9,
+# '0' and '.' to 0, any other char to INVALID
+INVALID = 0xFF
+FROM_TEXT = bytes(ch - ord('0') if ord('0') <= ch <= ord('9') else
+                  0 if ch == ord('.') else INVALID
+                  for ch in range(256))
+
+# chars dropped from grid rows, and the first chars of comment and
+# section lines
+_ROW_FILLER = b' \t|'
+_SKIPPED = b'#['
+
+# parse_buffer reads this much at a time (cut at a line end)
+_BLOCK = 1 << 20
+
 
 class SudokuError(Exception):
     """
@@ -14,63 +38,212 @@ class SudokuError(Exception):
 
 class SudokuBoard(object):
     """
-    Sudoku Board representation
+    Sudoku Board representation: the 81 cells, row by row, one byte
+    each (0 for a blank) in grid.
     """
 
-    def __init__(self, board_file):
-        self.board = self.__create_board(board_file)
+    __slots__ = ('grid',)
 
+    def __init__(self, board_file=None):
+        if board_file is None:
+            self.grid = bytearray(81)
 
-    def __create_board(self, board_file):
-        board = []
+        else:
+            self.grid = self.__create_board(board_file)
+
+
+    @classmethod
+    def from_string(cls, line):
+        """
+        Builds a board from the one-line format: 81 chars, row by
+        row, with '0' or '.' for the blanks.
+        """
+
+        board = cls.__new__(cls)
+        board.grid = _decode(line.strip().encode('latin-1', 'replace'))
 
-        for line in board_file:
-            line = line.strip()
-            if len(line) != 9:
-                raise SudokuError(
-                        'Each line in the sudoku puzzle must be 9 chars long.'
-                        )
+        return board
 
-            board.append([])
 
-            for ch in line:
+    def to_string(self):
+        """
+        The board in the one-line format, '0' for the blanks.
+        """
 
-                if not ch.isdigit():
-                    raise SudokuError(
-                            'Valid characters for the puzzle must be 0-9.'
-                            )
+        return self.grid.translate(TO_TEXT).decode('ascii')
 
-                board[-1].append(int(ch))
 
-        if len(board) != 9:
-            raise SudokuError('Each puzzle must be 9 lines long.')
+    def copy(self):
+        board = SudokuBoard.__new__(SudokuBoard)
+        board.grid = bytearray(self.grid)
 
         return board
 
 
+    def __str__(self):
+        return self.to_string()
+
+
+    def __eq__(self, other):
+        return isinstance(other, SudokuBoard) and self.grid == other.grid
+
+
+    def __hash__(self):
+        return hash(bytes(self.grid))
+
+
+    def __create_board(self, board_file):
+        for board in parse_lines(board_file):
+            return board.grid
+
+        raise SudokuError('Each puzzle must be 9 lines long.')
+
+
+def _decode(text):
+    """
+    The flat grid of the 81 chars of text.
+    """
+
+    if len(text) != 81:
+        raise SudokuError('A one-line sudoku puzzle must be 81 chars long.')
+
+    grid = text.translate(FROM_TEXT)
+
+    if INVALID in grid:
+        raise SudokuError('Valid characters for the puzzle must be 0-9 or \'.\'.')
+
+    return bytearray(grid)
+
+
+def parse_lines(lines):
+    """
+    Yields a SudokuBoard for every puzzle in lines (str or bytes).  A
+    puzzle is either one line of 81 chars (one-line and SDM formats),
+    possibly followed by whitespace and anything else, or nine lines
+    of 9 chars (SDK format), in which spaces, '|' and '-+' separator
+    lines are ignored.  Blank lines and lines starting with '#' or '['
+    are skipped.
+    """
+
+    return _boards(_records(enumerate(lines)))
+
+
+def parse_buffer(buffer):
+    """
+    parse_lines over a whole buffer (bytes, bytearray or mmap), split
+    into lines a block at a time so a mapped file is never copied
+    whole.
+    """
+
+    return _boards(_records(_lines(buffer)))
+
+
+def puzzle_offsets(buffer):
+    """
+    Yields the offset in buffer of the first line of each puzzle
+    parse_buffer would read, without decoding them.
+    """
+
+    for offset, _ in _records(_lines(buffer)):
+        yield offset
+
+
+def _boards(records):
+    for _, text in records:
+        board = SudokuBoard.__new__(SudokuBoard)
+        board.grid = _decode(text)
+
+        yield board
+
+
+def _records(lines):
+    """
+    Yields (key, text) for every puzzle in the (key, line) pairs of
+    lines: the key of its first line and its 81 chars.
+    """
+
+    rows = []
+
+    for key, line in lines:
+        if isinstance(line, str):
+            line = line.encode('latin-1', 'replace')
+
+        line = line.strip()
+
+        if not line or line[0] in _SKIPPED:
+            continue
+
+        if len(line) >= 81 and not rows:
+            yield key, line.split(None, 1)[0]
+            continue
+
+        row = line.translate(None, _ROW_FILLER)
+
+        if not row.strip(b'-+'):
+            continue
+
+        if len(row) != 9:
+            raise SudokuError('Each line in the sudoku puzzle must be 9 chars long.')
+
+        if not rows:
+            first = key
+
+        rows.append(row)
+
+        if len(rows) == 9:
+            yield first, b''.join(rows)
+            rows = []
+
+    if rows:
+        raise SudokuError('Each puzzle must be 9 lines long.')
+
+
+def _lines(buffer):
+    """
+    Yields (offset, line) for every line of buffer.
+    """
+
+    start, size = 0, len(buffer)
+
+    while start < size:
+        end = buffer.find(b'\n', min(start + _BLOCK, size - 1))
+        end = size if end < 0 else end + 1
+
+        for line in buffer[start:end].splitlines(True):
+            yield start, line
+            start += len(line)
+
+
 class SudokuGame(object):
     """
     A Sudoku game, in charge of storing the state of the board
     and checking whether the puzzle is completed.
+
+    The permissible entries of every cell are kept as bit masks in
+    candidates.  The GUI marks (2 crossed out, 3 struck by the
+    player, 4 flagged) live in masks of their own, so that
+    get_entry can still answer with the 0/1/2/3/4 states.
     """
 
-    def __init__(self, board_file):
+    def __init__(self, board_file=None):
         self.board_file = board_file
-        self.start_puzzle = SudokuBoard(board_file).board
-        self.start()
+        self.load(SudokuBoard(board_file))
 
-        self.entries = []
-        for i in range(9):
-            self.entries.append([])
-            for j in range(9):
-                self.entries[-1].append([-1] * 9)
 
-        self.__find_permissible_entries()
+    def load(self, board):
+        """
+        Starts over on a new SudokuBoard.  Its grid becomes the start
+        puzzle as is, without a copy.
+        """
+
+        self.start_puzzle = board.grid
+        self.start()
 
 
     def start(self):
         self.game_over = False
-        self.puzzle = []
+        self.puzzle = bytearray(self.start_puzzle)
+        self.__dirty = set()
         self.__reset_entries()
 
 
@@ -80,132 +253,108 @@ class SudokuGame(object):
 
     def get_entry(self, row, column, number=-1):
         if number == -1:
-            return self.entries[row][column]
+            return [self.get_entry(row, column, k) for k in range(9)]
 
-        else:
-            return self.entries[row][column][number]
+        cell, bit = 9 * row + column, BITS[number]
+
+        if self.candidates[cell] & bit:
+            return 1
+
+        for mark in MARKS:
+            if self.marks[mark][cell] & bit:
+                return mark
+
+        return 0
 
 
     def get_puzzle_entry(self, row, column):
-        return self.puzzle[row][column]
+        return self.puzzle[9 * row + column]
 
 
     def get_start_puzzle_entry(self, row, column):
-        return self.start_puzzle[row][column]
+        return self.start_puzzle[9 * row + column]
 
 
     def set_puzzle_entry(self, row, column, number):
-        self.puzzle[row][column] = number
+        self.puzzle[9 * row + column] = number
+        self.__dirty.add(9 * row + column)
 
 
     def __reset_entries(self):
-        self.entries = []
-        for i in range(9):
-            self.puzzle.append([])
-            self.entries.append([])
-            for j in range(9):
-                self.puzzle[i].append(self.start_puzzle[i][j])
-                self.entries[-1].append([-1] * 9)
+        self.candidates = new_candidates(0)
+        self.marks = {mark: new_candidates(0) for mark in MARKS}
 
         self.__find_permissible_entries()
 
 
-    def update_entries(self):
-        for i in range(9):
-            for j in range(9):
+    def __set_entry(self, cell, bit, value):
+        self.candidates[cell] &= ~bit
 
-                if self.start_puzzle[i][j] != 0:
-                    continue
+        for mark in MARKS:
+            self.marks[mark][cell] &= ~bit
 
-                if self.puzzle[i][j] != 0:
-                    for k in range(9):
-                        if k + 1 != self.puzzle[i][j] and self.entries[i][j][k] != 0:
-                            self.entries[i][j][k] = 2
+        if value == 1:
+            self.candidates[cell] |= bit
 
-                    self.entries[i][j][self.puzzle[i][j] - 1] = 1
+        elif value in MARKS:
+            self.marks[value][cell] |= bit
 
-        for i in range(9):
-            for j in range(9):
 
-                if self.start_puzzle[i][j] != 0 or self.puzzle[i][j] != 0:
-                    continue
-
-                for value in range(9):
-                    if self.entries[i][j][value] in [0, 3]:
-                        continue
+    def update_entries(self):
+        """
+        Brings the entries up to date with the puzzle entries set
+        since the last call: only the changed cells and their peers
+        are looked at.
+        """
 
-                    if self.entries[i][j][value] == 1:
+        cells = set(self.__dirty)
 
-                        for row in range(9):
-                            if row == i:
-                                continue
-                            if self.puzzle[row][j] == value + 1:
-                                self.entries[i][j][value] = 2
+        for cell in self.__dirty:
+            cells.update(PEERS[cell])
 
-                        for col in range(9):
-                            if col == j:
-                                continue
-                            if self.puzzle[i][col] == value + 1:
-                                self.entries[i][j][value] = 2
+        self.__dirty.clear()
 
-                        _row, _col = i // 3, j // 3
+        for cell in cells:
+            self.__update_entry(cell)
 
 
-                        for ii in range(3):
-                            new_row = 3 * _row + ii
-                            for jj in range(3):
-                                new_col = 3 * _col + jj
-                                if new_row == i and new_col == j:
-                                    continue
-                                if self.puzzle[new_row][new_col] == value + 1:
-                                    self.entries[i][j][value] = 2
+    def __update_entry(self, cell):
+        if self.start_puzzle[cell] != 0:
+            return
 
-                    if self.entries[i][j][value] == 2:
+        candidates = self.candidates
+        crossed, struck, flagged = (self.marks[mark] for mark in MARKS)
+        value = self.puzzle[cell]
 
-                        change = True
+        if value != 0:
+            bit = BITS[value - 1]
+            live = (candidates[cell] | crossed[cell]
+                    | struck[cell] | flagged[cell])
 
-                        for row in range(9):
-                            if row == i:
-                                continue
-                            if self.puzzle[row][j] == value + 1:
-                                change &= False
+            candidates[cell] = bit
+            crossed[cell] = live & ~bit
+            struck[cell] = flagged[cell] = 0
 
-                        for col in range(9):
-                            if col == j:
-                                continue
-                            if self.puzzle[i][col] == value + 1:
-                                change &= False
+        else:
+            seen = 0
 
-                        _row, _col = i // 3, j // 3
+            for peer in PEERS[cell]:
+                value = self.puzzle[peer]
 
-                        for ii in range(3):
-                            new_row = 3 * _row + ii
-                            for jj in range(3):
-                                new_col = 3 * _col + jj
-                                if new_row == i and new_col == j:
-                                    continue
-                                if self.puzzle[new_row][new_col] == value + 1:
-                                    change &= False
+                if value != 0:
+                    seen |= BITS[value - 1]
 
-                        if change:
-                            self.entries[i][j][value] = 1
+            live = candidates[cell] | crossed[cell]
 
+            candidates[cell] = live & ~seen
+            crossed[cell] = live & seen
 
 
     def check_win(self):
-        for row in range(9):
-            if not self.__check_row(row):
+        for unit in UNITS:
+            if not self.__check_block([self.puzzle[cell] for cell in unit]):
                 return False
 
-        for column in range(9):
-            if not self.__check_column(column):
-                return False
-
-        for row in range(3):
-            for column in range(3):
-                if not self.__check_box(row, column):
-                    return False
-
         self.game_over = True
 
         return True
@@ -215,61 +364,45 @@ class SudokuGame(object):
         return set(block) == set(range(1, 10))
 
 
-    def __check_row(self, row):
-        return self.__check_block(self.puzzle[row])
-
-
-    def __check_column(self, column):
-        return self.__check_block([self.puzzle[row][column] for row in range(9)])
-
-
-    def __check_box(self, row, column):
-        box = []
-        for r in range(row * 3, (row + 1) * 3):
-            for c in range(column * 3, (column + 1) * 3):
-                box.append(self.puzzle[r][c])
-
-        return self.__check_block(box)
-
     def find_permissible_entries(self, start_puzzle=True):
         self.__find_permissible_entries(start_puzzle=start_puzzle)
 
     def __find_permissible_entries(self, start_puzzle=True):
 
         grid = self.start_puzzle if start_puzzle else self.puzzle
+        candidates = self.candidates
 
-        for i in range(9):
-            for j in range(9):
+        for cell in range(81):
+            candidates[cell] = ALL
 
-                value = grid[i][j]
+        for cell in range(81):
 
-                if value != 0:
-                    self.entries[i][j] = [0] * 9
-                    self.entries[i][j][value - 1] = 1
+            value = grid[cell]
+
+            if value != 0:
+                candidates[cell] = BITS[value - 1]
 
-                    self.__helper_find(i, j, value)
+                self.__helper_find(cell, value)
 
-        for i in range(9):
-            for j in range(9):
-                for k in range(9):
-                    if self.entries[i][j][k] == -1:
-                        self.entries[i][j][k] = 1
+        for cell in range(81):
+            filled = grid[cell] != 0
 
+            for mark in MARKS:
+                masks = self.marks[mark]
 
-    def __helper_find(self, row, col, value):
-        for x in range(9):
-            if x != col:
-                self.entries[row][x][value - 1] = 0
+                if filled:
+                    masks[cell] = 0
 
-            if x != row:
-                self.entries[x][col][value - 1] = 0
+                else:
+                    masks[cell] &= candidates[cell]
+                    candidates[cell] &= ~masks[cell]
 
-        i, j = row // 3, col // 3
 
-        for ii in range(3):
-            for jj in range(3):
-                if 3 * i + ii != row or 3 * j + jj != col:
-                    self.entries[3 * i + ii][3 * j + jj][value - 1] = 0
+    def __helper_find(self, cell, value):
+        candidates, bit = self.candidates, ~BITS[value - 1]
+
+        for peer in PEERS[cell]:
+            candidates[peer] &= bit
 
 
     def find_offending_entries(self, offending_number, row, column):
@@ -288,23 +421,9 @@ class SudokuGame(object):
 
         contradictions = []
 
-        for i in range(SUDOKU_SIZE):
-            if i != row and self.puzzle[i][column] == offending_number:
-                contradictions.append((i, column))
-
-        for j in range(SUDOKU_SIZE):
-            if j != column and self.puzzle[row][j] == offending_number:
-                contradictions.append((row, j))
-
-        _row, _col = row // 3, column // 3
-
-        for ii in range(SUDOKU_BOX_SIZE):
-            for jj in range(SUDOKU_BOX_SIZE):
-                cell_row, cell_col = _row * 3 + ii, _col * 3 + jj
-                if cell_row == row and cell_col == column:
-                    continue
-                if self.puzzle[cell_row][cell_col] == offending_number:
-                    contradictions.append((cell_row, cell_col))
+        for peer in PEERS[9 * row + column]:
+            if self.puzzle[peer] == offending_number:
+                contradictions.append((ROW[peer], COL[peer]))
 
         return contradictions
 
@@ -315,13 +434,14 @@ class SudokuGame(object):
 
         """
 
-        if value != -1:
-            self.entries[row][col][number] = value
-
-        elif self.entries[row][col][number] == 1:
-            self.entries[row][col][number] = 2
+        cell, bit = 9 * row + col, BITS[number]
+        self.__dirty.add(cell)
 
-        elif self.entries[row][col][number] == 2:
-            self.entries[row][col][number] = 1
+        if value != -1:
+            self.__set_entry(cell, bit, value)
 
+        elif self.candidates[cell] & bit:
+            self.__set_entry(cell, bit, 2)
 
+        elif self.marks[2][cell] & bit:
+            self.__set_entry(cell, bit, 1)
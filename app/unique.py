@@ -7,66 +7,72 @@
 #                   that entry.
 
 
-def __unique_row(sudoku_game, row, char):
-    count, _col = 0, -1
+from candidates import BITS, NUMBER
+from strategies import register
+from units import BOXES, COL, COLS, ROW, ROWS
 
-    for col in range(9):
-        if sudoku_game.game.entries[row][col][char] != 0:
-            count += 1
-            _col = col
 
-    return (True, row, _col) if count == 1 else (False, -1, -1)
+def __unique_in(sudoku_game, units, name, found):
+    """
+    For every unit, finds the numbers that fit in exactly one of its
+    empty cells and records them in found as cell: (name, number).
+    """
 
+    candidates, puzzle = sudoku_game.game.candidates, sudoku_game.game.puzzle
 
+    for unit in units:
+        once = twice = solved = 0
 
-def __unique_col(sudoku_game, col, char):
-    count, _row = 0, -1
+        for cell in unit:
+            mask = candidates[cell]
 
-    for row in range(9):
-        if sudoku_game.game.entries[row][col][char] != 0:
-            count += 1
-            _row = row
+            if puzzle[cell] != 0:
+                solved |= mask
+                continue
 
-    return (True, _row, col) if count == 1 else (False, -1, -1)
+            twice |= once & mask
+            once |= mask
 
+        singles = once & ~twice & ~solved
 
-def __unique_box(sudoku_game, row, col, char):
-    count, row, col = 0, row // 3 * 3, col // 3 * 3
-    _row, _col = -1, -1
+        if not singles:
+            continue
 
-    for i in range(3):
-        for j in range(3):
-            if sudoku_game.game.entries[row + i][col + j][char] != 0:
-                count += 1
-                _row, _col = row + i, col + j
+        for cell in unit:
+            mask = candidates[cell] & singles
 
-    return (True, _row, _col) if count == 1 else (False, -1, -1)
+            if mask and puzzle[cell] == 0 and cell not in found:
+                found[cell] = (name, NUMBER[mask])
 
 
-def __unique_cleanup(sudoku_game, i, j, k):
-    sudoku_game.game.puzzle[i][j] = k + 1
-    sudoku_game.game.entries[i][j] = [0] * 9
-    sudoku_game.game.entries[i][j][k] = 1
-    sudoku_game.cleanup_at(i, j)
+@register(0)
+def unique(sudoku_game):
+    """
+    Places every hidden single of the board in one sweep.  Returns
+    whether anything was placed and the list of
+    (name, row, col, number) placements.
+    """
 
+    found = {}
 
-def unique(sudoku_game):
-    for i in range(9):
-        for j in range(9):
-            for k in range(9):
-                if (sudoku_game.game.puzzle[i][j] == 0
-                        and sudoku_game.game.entries[i][j][k] != 0):
+    __unique_in(sudoku_game, ROWS, 'unique_row', found)
+    __unique_in(sudoku_game, COLS, 'unique_col', found)
+    __unique_in(sudoku_game, BOXES, 'unique_box', found)
+
+    candidates, puzzle = sudoku_game.game.candidates, sudoku_game.game.puzzle
+    steps = []
 
-                    if __unique_row(sudoku_game, i, k)[0]:
-                        __unique_cleanup(sudoku_game, i, j, k)
-                        return True, 'unique_row', i, j, k
+    for cell, (name, number) in sorted(found.items()):
+        row, col = ROW[cell], COL[cell]
 
-                    if __unique_col(sudoku_game, j, k)[0]:
-                        __unique_cleanup(sudoku_game, i, j, k)
-                        return True, 'unique_col', i, j, k
+        # NUMBER is 0 for a cell that is the only place for two
+        # numbers; an earlier placement may also have taken the
+        # number away from a peer.
+        if (number == 0 or puzzle[cell] != 0
+                or not candidates[cell] & BITS[number - 1]):
+            continue
 
-                    if __unique_box(sudoku_game, i, j, k)[0]:
-                        __unique_cleanup(sudoku_game, i, j, k)
-                        return True, 'unique_box', i, j, k
+        sudoku_game.place(row, col, number)
+        steps.append((name, row, col, number))
 
-    return False, '', -1, -1, -1
+    return bool(steps), steps
@@ -0,0 +1,29 @@
+# file:     units.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# Units and peers:  cells are numbered 0-80 row by row.  A unit is a
+#                   row, a column or a box; the peers of a cell are
+#                   the 20 other cells sharing a unit with it.  All
+#                   the tables are built once, on import.
+
+
+ROWS = tuple(tuple(9 * row + col for col in range(9)) for row in range(9))
+COLS = tuple(tuple(9 * row + col for row in range(9)) for col in range(9))
+BOXES = tuple(tuple(9 * (box // 3 * 3 + i) + box % 3 * 3 + j
+                    for i in range(3) for j in range(3))
+              for box in range(9))
+
+UNITS = ROWS + COLS + BOXES
+
+ROW = tuple(cell // 9 for cell in range(81))
+COL = tuple(cell % 9 for cell in range(81))
+BOX = tuple(cell // 27 * 3 + cell % 9 // 3 for cell in range(81))
+
+# cell -> (its row, its column, its box)
+CELL_UNITS = tuple((ROWS[ROW[cell]], COLS[COL[cell]], BOXES[BOX[cell]])
+                   for cell in range(81))
+
+PEERS = tuple(tuple(sorted(set(peer for unit in CELL_UNITS[cell]
+                               for peer in unit) - {cell}))
+              for cell in range(81))
@@ -0,0 +1,55 @@
+# file:     xwing.py
+# author:   Adam Felix
+# help:     Sudoku Programming in C (Giulio Zambon)
+
+# X-Wing strategy:  If a number fits in two rows only in the same two
+#                   columns, then it goes in those columns in one of
+#                   those rows, and can be removed from the rest of
+#                   both columns.  The same holds with rows and
+#                   columns swapped.
+
+
+from itertools import combinations
+
+from candidates import BITS, POPCOUNT
+from strategies import eliminate, empty_cells, register
+from units import COLS, ROWS
+
+
+def __xwing(sudoku_game, lines, crosses, name):
+    candidates = sudoku_game.game.candidates
+    steps = []
+
+    for bit in BITS:
+        # line index -> mask of the crossing lines where the number fits
+        pairs = {}
+
+        for i, line in enumerate(lines):
+            mask = 0
+
+            for j, cell in enumerate(line):
+                if candidates[cell] & bit:
+                    mask |= 1 << j
+
+            if POPCOUNT[mask] == 2:
+                pairs[i] = mask
+
+        for i, j in combinations(sorted(pairs), 2):
+            if pairs[i] != pairs[j]:
+                continue
+
+            for k in range(9):
+                if pairs[i] & 1 << k:
+                    others = [cell for cell in empty_cells(sudoku_game, crosses[k])
+                              if cell not in lines[i] and cell not in lines[j]]
+                    eliminate(sudoku_game, name, others, bit, steps)
+
+    return bool(steps), steps
+
+
+@register(3)
+def xwing(sudoku_game):
+    changed, steps = __xwing(sudoku_game, ROWS, COLS, 'xwing_row')
+    changed_cols, steps_cols = __xwing(sudoku_game, COLS, ROWS, 'xwing_col')
+
+    return changed or changed_cols, steps + steps_cols